@@ -2,7 +2,9 @@
 '''Task 1's module.
 '''
 import asyncio
-from typing import List
+import heapq
+import random
+from typing import AsyncIterator, List
 
 
 wait_random = __import__('0-basic_async_syntax').wait_random
@@ -15,3 +17,28 @@ async def wait_n(n: int, max_delay: int) -> List[float]:
         *tuple(map(lambda _: wait_random(max_delay), range(n)))
     )
     return sorted(wait_times)
+
+
+async def wait_n_iter(n: int, max_delay: int,
+                      yield_every: int = 1000) -> AsyncIterator[float]:
+    '''Yields n wait_random delays in completion order.
+
+    Instead of n coroutines, the delays are kept in a timer heap and a
+    single coroutine sleeps until the next one is due, so each wait costs
+    one float and the delays come out already sorted. While behind
+    schedule it still yields to the event loop every `yield_every` delays.
+    '''
+    delays = [random.random() * max_delay for _ in range(n)]
+    heapq.heapify(delays)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    count = 0
+    while delays:
+        delay = heapq.heappop(delays)
+        remaining = start + delay - loop.time()
+        count += 1
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        elif count % yield_every == 0:
+            await asyncio.sleep(0)
+        yield delay
@@ -2,15 +2,40 @@
 '''Task 2's module.
 '''
 import asyncio
-import time
+from typing import Any, Awaitable, Optional
 
 
 wait_n = __import__('1-concurrent_coroutines').wait_n
+benchmark_runtime = __import__('benchmark_runtime')
+loop_runner = __import__('loop_runner')
 
 
-def measure_time(n: int, max_delay: int) -> float:
+async def loop_elapsed(main: Awaitable[Any]) -> float:
+    '''Awaits main and returns the seconds it took on the running loop's
+    clock, which is virtual under virtual_time.VirtualTimeLoop.
+    '''
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await main
+    return loop.time() - start
+
+
+def measure_time(n: int, max_delay: int,
+                 runner: Optional[loop_runner.LoopRunner] = None) -> float:
     '''Computes the average runtime of wait_n.
+
+    It runs on `runner`, by default the shared loop_runner loop, whose
+    creation time is reported by its stats() rather than counted here.
+    '''
+    runner = runner or loop_runner.get_runner()
+    return runner.run(loop_elapsed(wait_n(n, max_delay))) / n
+
+
+def measure_time_stats(n: int, max_delay: int, trials: int = 5,
+                       warmup: int = 1) -> benchmark_runtime.AsyncStats:
+    '''Measures wait_n(n, max_delay) over repeated trials, reporting
+    runtime percentiles and the event-loop lag seen meanwhile.
     '''
-    start_time = time.time()
-    asyncio.run(wait_n(n, max_delay))
-    return (time.time() - start_time) / n
+    return benchmark_runtime.run_benchmark_async(
+        lambda: wait_n(n, max_delay), trials=trials, warmup=warmup
+    )
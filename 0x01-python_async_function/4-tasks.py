@@ -2,7 +2,7 @@
 '''Task 4's module.
 '''
 import asyncio
-from typing import List
+from typing import AsyncIterator, List, Optional, Set
 
 
 task_wait_random = __import__('3-tasks').task_wait_random
@@ -15,3 +15,33 @@ async def task_wait_n(n: int, max_delay: int) -> List[float]:
         *tuple(map(lambda _: task_wait_random(max_delay), range(n)))
     )
     return sorted(wait_times)
+
+
+async def task_wait_n_iter(n: int, max_delay: int,
+                           concurrency: Optional[int] = None
+                           ) -> AsyncIterator[float]:
+    '''Executes task_wait_random n times, yielding each delay as soon as
+    its task finishes, so the first result arrives after the shortest
+    delay rather than the longest.
+
+    At most `concurrency` tasks run at once (all n when None). Tasks still
+    running when the caller stops iterating early are cancelled.
+    '''
+    limit = n if concurrency is None else max(1, concurrency)
+    started = 0
+    pending: Set[asyncio.Task] = set()
+    try:
+        while started < n or pending:
+            while started < n and len(pending) < limit:
+                pending.add(task_wait_random(max_delay))
+                started += 1
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for wait_time in sorted(task.result() for task in done):
+                yield wait_time
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
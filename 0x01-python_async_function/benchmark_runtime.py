@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+'''Runtime measurement utilities shared by the measure functions.
+
+Times are taken with `time.perf_counter_ns`, after optional warmup runs,
+over repeated trials, and summarized with percentiles and a 95%
+confidence interval for the mean. `benchmark_async` also samples the
+event loop's lag while the workload runs.
+
+Modules in other directories import it after adding this directory to
+`sys.path`.
+'''
+import asyncio
+import math
+import statistics
+import time
+from typing import Any, Awaitable, Callable, List, NamedTuple, Sequence
+
+
+loop_runner = __import__('loop_runner')
+
+
+# Two-sided 95% Student t critical values by degrees of freedom;
+# above 30 degrees of freedom the normal value 1.96 is used.
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447,
+    7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179,
+    13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101,
+    19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064,
+    25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+}
+
+
+class Stats(NamedTuple):
+    '''Summary of a list of samples, in nanoseconds.
+    '''
+    trials: int
+    mean: float
+    stdev: float
+    minimum: float
+    maximum: float
+    p50: float
+    p90: float
+    p99: float
+    ci95: float
+
+    def seconds(self, field: str = 'mean') -> float:
+        '''Returns one of the fields converted to seconds.
+        '''
+        return getattr(self, field) / 1e9
+
+    def __str__(self) -> str:
+        ms = {k: v / 1e6 for k, v in self._asdict().items() if k != 'trials'}
+        return ('{trials} trials: mean {mean:.3f} ms'
+                ' ± {ci95:.3f} ms (95% CI),'
+                ' p50 {p50:.3f} ms, p90 {p90:.3f} ms, p99 {p99:.3f} ms,'
+                ' min {minimum:.3f} ms, max {maximum:.3f} ms'
+                ).format(trials=self.trials, **ms)
+
+
+class AsyncStats(NamedTuple):
+    '''Workload timings plus the event-loop lag observed meanwhile.
+    '''
+    runtime: Stats
+    loop_lag: Stats
+
+    def __str__(self) -> str:
+        return 'runtime: {}\nloop lag: {}'.format(self.runtime, self.loop_lag)
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    '''Linearly interpolated percentile of an already sorted sequence.
+    '''
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples: Sequence[float]) -> Stats:
+    '''Computes Stats for a list of samples.
+    '''
+    ordered = sorted(samples)
+    count = len(ordered)
+    mean = statistics.fmean(ordered) if count else 0.0
+    stdev = statistics.stdev(ordered) if count > 1 else 0.0
+    t = T_95.get(count - 1, 1.96)
+    return Stats(
+        trials=count,
+        mean=mean,
+        stdev=stdev,
+        minimum=ordered[0] if count else 0.0,
+        maximum=ordered[-1] if count else 0.0,
+        p50=percentile(ordered, 0.50),
+        p90=percentile(ordered, 0.90),
+        p99=percentile(ordered, 0.99),
+        ci95=t * stdev / math.sqrt(count) if count > 1 else 0.0,
+    )
+
+
+class Timer:
+    '''A context manager measuring its block with perf_counter_ns.
+    '''
+    def __init__(self) -> None:
+        self.start = 0
+        self.elapsed_ns = 0
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.elapsed_ns = time.perf_counter_ns() - self.start
+
+    @property
+    def elapsed(self) -> float:
+        '''The elapsed time in seconds.
+        '''
+        return self.elapsed_ns / 1e9
+
+
+def benchmark(func: Callable[[], Any], trials: int = 10,
+              warmup: int = 1) -> Stats:
+    '''Times `trials` calls of func after `warmup` untimed calls.
+    '''
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(trials):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+async def sample_loop_lag(stop: asyncio.Event, samples: List[int],
+                          interval: float = 0.001) -> None:
+    '''Records, until `stop` is set, how many nanoseconds late a
+    periodic `interval` second sleep wakes up.
+    '''
+    interval_ns = int(interval * 1e9)
+    while not stop.is_set():
+        start = time.perf_counter_ns()
+        await asyncio.sleep(interval)
+        samples.append(max(0, time.perf_counter_ns() - start - interval_ns))
+
+
+async def benchmark_async(factory: Callable[[], Awaitable[Any]],
+                          trials: int = 10, warmup: int = 1,
+                          lag_interval: float = 0.001) -> AsyncStats:
+    '''Times `trials` awaits of factory() after `warmup` untimed ones,
+    sampling the event-loop lag during the timed trials.
+    '''
+    for _ in range(warmup):
+        await factory()
+    samples = []
+    lags: List[int] = []
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(sample_loop_lag(stop, lags, lag_interval))
+    try:
+        for _ in range(trials):
+            start = time.perf_counter_ns()
+            await factory()
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        stop.set()
+        await sampler
+    return AsyncStats(summarize(samples), summarize(lags))
+
+
+def run_benchmark_async(factory: Callable[[], Awaitable[Any]],
+                        trials: int = 10, warmup: int = 1,
+                        lag_interval: float = 0.001) -> AsyncStats:
+    '''Runs benchmark_async on the shared loop_runner loop.
+    '''
+    return loop_runner.get_runner().run(
+        benchmark_async(factory, trials, warmup, lag_interval)
+    )
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+'''Benchmarks wait_n against wait_n_iter for growing n.
+'''
+import tracemalloc
+from typing import Dict, Sequence
+
+
+concurrent_coroutines = __import__('1-concurrent_coroutines')
+benchmark_runtime = __import__('benchmark_runtime')
+loop_runner = __import__('loop_runner')
+wait_n = concurrent_coroutines.wait_n
+wait_n_iter = concurrent_coroutines.wait_n_iter
+
+
+def benchmark_wait_n(sizes: Sequence[int] = (10 ** 3, 10 ** 4,
+                                             10 ** 5, 10 ** 6),
+                     max_delay: float = 0.01, trials: int = 3,
+                     gather_limit: int = 10 ** 5) -> Dict[int, Dict]:
+    '''Times wait_n and wait_n_iter for each n in sizes over `trials`
+    runs, then measures the peak memory traced in one separate run, so
+    tracing does not inflate the timings. wait_n is skipped above
+    `gather_limit`, where it needs gigabytes of coroutine objects.
+    '''
+    async def gathered(n: int) -> None:
+        await wait_n(n, max_delay)
+
+    async def streamed(n: int) -> None:
+        async for _ in wait_n_iter(n, max_delay):
+            pass
+
+    runner = loop_runner.get_runner()
+    results: Dict[int, Dict] = {}
+    for n in sizes:
+        results[n] = {}
+        for name, run in (('wait_n', gathered), ('wait_n_iter', streamed)):
+            if name == 'wait_n' and n > gather_limit:
+                continue
+            stats = benchmark_runtime.benchmark(
+                lambda: runner.run(run(n)), trials=trials, warmup=0
+            )
+            tracemalloc.start()
+            runner.run(run(n))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[n][name] = {
+                'seconds': stats.seconds(),
+                'ci95_seconds': stats.seconds('ci95'),
+                'peak_mb': peak / 2 ** 20,
+            }
+    return results
+
+
+if __name__ == '__main__':
+    for n, timings in benchmark_wait_n().items():
+        for name, result in timings.items():
+            print('n={} {}: {}'.format(n, name, result))
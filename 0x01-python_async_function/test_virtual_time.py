@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""A module for testing the async functions on a virtual clock.
+"""
+import time
+import unittest
+
+virtual_time = __import__('virtual_time')
+wait_n = __import__('1-concurrent_coroutines').wait_n
+measure_time = __import__('2-measure_runtime').measure_time
+tasks = __import__('4-tasks')
+
+
+class TestWaitN(unittest.TestCase):
+    """Tests `wait_n` under `VirtualTimeLoop`."""
+    def test_wait_n(self) -> None:
+        """Tests that `wait_n` returns sorted delays after the longest."""
+        start = time.perf_counter()
+        delays, elapsed = virtual_time.run_timed(wait_n(1000, 10), seed=0)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(len(delays), 1000)
+        self.assertEqual(delays, sorted(delays))
+        self.assertTrue(all(0 <= delay <= 10 for delay in delays))
+        self.assertAlmostEqual(elapsed, delays[-1], places=6)
+
+    def test_wait_n_seeded(self) -> None:
+        """Tests that a seed makes the delays repeatable."""
+        first = virtual_time.run(wait_n(50, 10), seed=1)
+        second = virtual_time.run(wait_n(50, 10), seed=1)
+        self.assertEqual(first, second)
+
+    def test_measure_time(self) -> None:
+        """Tests `measure_time` on a virtual-clock runner."""
+        with virtual_time.runner(seed=2) as runner:
+            average = measure_time(100, 10, runner=runner)
+        self.assertGreater(average, 0)
+        self.assertLessEqual(average, 10 / 100)
+
+
+class TestTaskWaitN(unittest.TestCase):
+    """Tests `task_wait_n` and `task_wait_n_iter` under `VirtualTimeLoop`."""
+    def test_task_wait_n(self) -> None:
+        """Tests that `task_wait_n` matches `wait_n` for the same seed."""
+        delays, elapsed = virtual_time.run_timed(
+            tasks.task_wait_n(200, 5), seed=3
+        )
+        self.assertEqual(delays, virtual_time.run(wait_n(200, 5), seed=3))
+        self.assertAlmostEqual(elapsed, delays[-1], places=6)
+
+    def test_task_wait_n_iter_first_result(self) -> None:
+        """Tests that the first delay arrives after the shortest one."""
+        async def first() -> float:
+            results = tasks.task_wait_n_iter(100, 10)
+            try:
+                return await results.__anext__()
+            finally:
+                await results.aclose()
+
+        delay, elapsed = virtual_time.run_timed(first(), seed=4)
+        self.assertAlmostEqual(elapsed, delay, places=6)
+        self.assertLess(elapsed, 1)
+
+    def test_task_wait_n_iter_concurrency(self) -> None:
+        """Tests that one task at a time runs the delays back to back."""
+        async def collect() -> list:
+            return [d async for d in tasks.task_wait_n_iter(20, 1, 1)]
+
+        delays, elapsed = virtual_time.run_timed(collect(), seed=5)
+        self.assertEqual(len(delays), 20)
+        self.assertAlmostEqual(elapsed, sum(delays), places=6)
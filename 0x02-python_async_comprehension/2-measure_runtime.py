@@ -2,17 +2,48 @@
 '''Task 2's module.
 '''
 import asyncio
-import time
+import os
+import sys
 from importlib import import_module as using
+from typing import Any, List, Optional
 
 
 async_comprehension = using('1-async_comprehension').async_comprehension
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', '0x01-python_async_function'
+))
+benchmark_runtime = using('benchmark_runtime')
+loop_runner = using('loop_runner')
 
 
 async def measure_runtime() -> float:
     '''Executes async_comprehension 4 times and measures the
     total execution time.
     '''
-    start_time = time.time()
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
     await asyncio.gather(*(async_comprehension() for _ in range(4)))
-    return time.time() - start_time
+    return loop.time() - start_time
+
+
+async def measure_runtime_stats(trials: int = 3,
+                                warmup: int = 0
+                                ) -> benchmark_runtime.AsyncStats:
+    '''Measures four parallel async_comprehension runs over repeated
+    trials, reporting runtime percentiles and event-loop lag.
+    '''
+    return await benchmark_runtime.benchmark_async(
+        lambda: asyncio.gather(*(async_comprehension() for _ in range(4))),
+        trials=trials, warmup=warmup
+    )
+
+
+def run_measure_runtime(runs: int = 1,
+                        runner: Optional[Any] = None) -> List[float]:
+    '''Runs measure_runtime `runs` times on `runner` (by default the
+    shared loop_runner loop), so a new event loop is not created for
+    every run.
+    '''
+    runner = runner or loop_runner.get_runner()
+    return [runner.run(measure_runtime()) for _ in range(runs)]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""A module for testing the async comprehension on a virtual clock.
+"""
+import os
+import sys
+import unittest
+from importlib import import_module as using
+
+measure_runtime = using('2-measure_runtime')
+async_comprehension = using('1-async_comprehension').async_comprehension
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', '0x01-python_async_function'
+))
+virtual_time = using('virtual_time')
+
+
+class TestAsyncComprehension(unittest.TestCase):
+    """Tests `async_comprehension` under `VirtualTimeLoop`."""
+    def test_async_comprehension(self) -> None:
+        """Tests that ten numbers arrive after ten virtual seconds."""
+        numbers, elapsed = virtual_time.run_timed(async_comprehension())
+        self.assertEqual(len(numbers), 10)
+        self.assertTrue(all(0 <= number <= 10 for number in numbers))
+        self.assertAlmostEqual(elapsed, 10, places=6)
+
+    def test_measure_runtime(self) -> None:
+        """Tests that four parallel comprehensions take ten seconds."""
+        with virtual_time.runner(seed=0) as runner:
+            runtimes = measure_runtime.run_measure_runtime(2, runner=runner)
+        for runtime in runtimes:
+            self.assertAlmostEqual(runtime, 10, places=6)
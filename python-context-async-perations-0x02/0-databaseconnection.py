@@ -1,19 +1,151 @@
 #!/usr/bin/python3
 """
 This module demonstrates a custom class-based context manager for
-handling database connections automatically.
+handling database connections automatically, plus a pool-backed variant
+that reuses warm connections across `with` blocks.
 """
+import time
 import sqlite3
+import threading
+
+# How a transaction takes its locks: DEFERRED waits for the first read or
+# write, IMMEDIATE reserves the write lock at BEGIN, EXCLUSIVE also blocks
+# readers.
+ISOLATION_LEVELS = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def _check_isolation(isolation):
+    if isolation not in ISOLATION_LEVELS:
+        raise ValueError(
+            f"isolation must be one of {ISOLATION_LEVELS}, not {isolation!r}"
+        )
+    return isolation
+
+
+def _begin(conn, isolation):
+    if not conn.in_transaction:
+        conn.execute(f"BEGIN {isolation}")
+
+
+def _finish(conn, success):
+    """Commits on success, rolls back otherwise."""
+    if success:
+        conn.commit()
+    else:
+        conn.rollback()
+
+
+class GroupCommit:
+    """
+    Shares one connection and one transaction between consecutive
+    transactional `with` blocks so that many blocks cost a single commit
+    (and fsync). The transaction is committed after `max_blocks` blocks or
+    `max_delay` seconds after its first block (by a timer, so the write
+    lock is released even when no further block arrives), and on
+    flush()/close().
+
+    Each block runs in its own SAVEPOINT: a failing block is rolled back
+    alone. Blocks are serialized, and a block's writes are only durable
+    once its group has committed.
+    """
+    def __init__(self, db_name, max_blocks=100, max_delay=0.05,
+                 isolation='DEFERRED'):
+        self.db_name = db_name
+        self.max_blocks = max_blocks
+        self.max_delay = max_delay
+        self.isolation = _check_isolation(isolation)
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.pending = 0
+        self.commits = 0
+        self._group_started = None
+        # Incremented per group so a late timer cannot commit the next one
+        self._group = 0
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def enter(self):
+        """Starts a block; returns the shared connection."""
+        self._lock.acquire()
+        try:
+            if not self.conn.in_transaction:
+                self.conn.execute(f"BEGIN {self.isolation}")
+                self._group_started = time.monotonic()
+                self._group += 1
+                self._timer = threading.Timer(
+                    self.max_delay, self._flush_group, (self._group,)
+                )
+                self._timer.daemon = True
+                self._timer.start()
+            self.conn.execute("SAVEPOINT group_block")
+        except Exception:
+            self._lock.release()
+            raise
+        return self.conn
+
+    def exit(self, success):
+        """Ends a block, committing the group if it is due."""
+        try:
+            if not success:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK TO group_block")
+                    self.conn.execute("RELEASE group_block")
+                return
+            self.conn.execute("RELEASE group_block")
+            self.pending += 1
+            if (self.pending >= self.max_blocks
+                    or time.monotonic() - self._group_started >= self.max_delay):
+                self.flush()
+        finally:
+            self._lock.release()
+
+    def _flush_group(self, group):
+        """Timer callback: commits `group` if it is still the open one."""
+        with self._lock:
+            if group == self._group:
+                self.flush()
+
+    def flush(self):
+        """Commits the blocks of the current group."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self.conn.in_transaction:
+                self.conn.commit()
+                self.commits += 1
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
 
 class DatabaseConnection:
     """
     A class-based context manager for SQLite database connections.
+
+    With transactional=True the block runs in a transaction started with
+    `BEGIN <isolation>` that is committed when the block succeeds and
+    rolled back when it raises. Passing a GroupCommit instead batches the
+    commits of consecutive blocks.
     """
-    def __init__(self, db_name):
+    def __init__(self, db_name, transactional=False, isolation='DEFERRED',
+                 group_commit=None):
         """
         Initializes the context manager with the database file name.
+
+        Args:
+            db_name (str): The name of the database file.
+            transactional (bool): Commit on success, roll back on error.
+            isolation (str): DEFERRED, IMMEDIATE or EXCLUSIVE.
+            group_commit (GroupCommit, optional): Share its connection and
+                                                  commit in groups (implies
+                                                  transactional).
         """
         self.db_name = db_name
+        self.transactional = transactional or group_commit is not None
+        self.isolation = _check_isolation(isolation)
+        self.group_commit = group_commit
         self.conn = None
 
     def __enter__(self):
@@ -21,26 +153,198 @@ class DatabaseConnection:
         Called when entering the 'with' block.
         Establishes the database connection and returns it.
         """
+        if self.group_commit is not None:
+            self.conn = self.group_commit.enter()
+            return self.conn
         print(f"LOG: Opening connection to '{self.db_name}'...")
         self.conn = sqlite3.connect(self.db_name)
+        if self.transactional:
+            _begin(self.conn, self.isolation)
         return self.conn
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Called when exiting the 'with' block.
-        Ensures the database connection is closed.
+        Ensures the database connection is closed, after committing or
+        rolling back in transactional mode.
         
         The arguments exc_type, exc_val, exc_tb contain exception
         information if an error occurred inside the 'with' block.
         """
+        if self.group_commit is not None:
+            self.conn = None
+            self.group_commit.exit(success=exc_type is None)
+            return False
         if self.conn:
-            print(f"LOG: Closing connection to '{self.db_name}'...")
-            self.conn.close()
+            try:
+                if self.transactional:
+                    _finish(self.conn, success=exc_type is None)
+            finally:
+                print(f"LOG: Closing connection to '{self.db_name}'...")
+                self.conn.close()
+                self.conn = None
         
         # If an exception occurred, returning False will re-raise it.
         # Returning True would suppress it. We want it to be re-raised.
         return False
 
+class ConnectionPool:
+    """
+    A thread-safe pool of sqlite3 connections to one database.
+
+    At most `max_size` connections exist at once; acquire() waits up to
+    `timeout` seconds for one to be returned. A connection that sat idle
+    longer than `health_check_interval` seconds is probed with `SELECT 1`
+    before it is handed out and replaced if the probe fails.
+    """
+    def __init__(self, db_name, max_size=5, timeout=5.0,
+                 health_check_interval=30.0, debug=False):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.debug = debug
+        self._idle = []  # (connection, time it was returned)
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def _log(self, message):
+        if self.debug:
+            print(f"LOG: {message}")
+
+    def _connect(self):
+        self._log(f"Opening pooled connection to '{self.db_name}'...")
+        return sqlite3.connect(self.db_name, check_same_thread=False)
+
+    def _is_healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Checks out a connection, waiting up to `timeout` seconds."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"no connection to '{self.db_name}' available "
+                            f"within {self.timeout} second(s)"
+                        )
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self._size += 1
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+            if self._is_healthy(conn, idle_since):
+                return conn
+            self._log(f"Discarding unhealthy connection to '{self.db_name}'")
+            self._discard(conn)
+
+    def release(self, conn):
+        """Returns a connection, rolling back any open transaction."""
+        try:
+            if conn.in_transaction:
+                self._log("Rolling back open transaction before reuse")
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._forget()
+
+    def close(self):
+        """Closes all idle connections."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._log(f"Closing pooled connection to '{self.db_name}'...")
+            self._discard(conn)
+
+
+# One shared pool per database file
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name, **options):
+    """
+    Returns the shared ConnectionPool for db_name, creating it with
+    `options` (see ConnectionPool) on first use.
+    """
+    with _pools_lock:
+        if db_name not in _pools:
+            _pools[db_name] = ConnectionPool(db_name, **options)
+        return _pools[db_name]
+
+
+class PooledDatabaseConnection:
+    """
+    A context manager like DatabaseConnection that checks a warm connection
+    out of a ConnectionPool on entry and returns it on exit, rolling back
+    any transaction left open, instead of connecting and closing each time.
+    The transactional and isolation options behave as in DatabaseConnection.
+    """
+    def __init__(self, db_name, pool=None, transactional=False,
+                 isolation='DEFERRED'):
+        """
+        Initializes the context manager with the database file name and
+        an optional pool (defaults to the shared pool for db_name).
+        """
+        self.db_name = db_name
+        self.pool = pool if pool is not None else get_pool(db_name)
+        self.transactional = transactional
+        self.isolation = _check_isolation(isolation)
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        if self.transactional:
+            try:
+                _begin(self.conn, self.isolation)
+            except Exception:
+                self.pool.release(self.conn)
+                self.conn = None
+                raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.conn:
+            conn, self.conn = self.conn, None
+            try:
+                if self.transactional:
+                    _finish(conn, success=exc_type is None)
+            finally:
+                self.pool.release(conn)
+        return False
+
+
 # --- Main execution block ---
 if __name__ == '__main__':
     # Ensure you have run setup_db.py first to create 'task_database.db'
@@ -70,3 +374,11 @@ if __name__ == '__main__':
     except sqlite3.OperationalError as e:
         print(f"\nDatabase Error: {e}. Please run the setup_db.py script.")
 
+    # --- Short blocks with the pooled variant reuse one warm connection ---
+    print("\n--- Using the PooledDatabaseConnection context manager ---")
+    start = time.perf_counter()
+    for _ in range(1000):
+        with PooledDatabaseConnection(db_file) as conn:
+            conn.execute("SELECT 1").fetchone()
+    print(f"1000 pooled blocks took {time.perf_counter() - start:.4f} seconds")
+
@@ -5,55 +5,122 @@ handles the database connection but also executes a query.
 """
 import sqlite3
 
+get_pool = __import__('0-databaseconnection').get_pool
+
+# Rows fetched per fetchmany() call when iterating an ExecuteQuery
+CHUNK_SIZE = 500
+
+
+def is_bulk(params):
+    """True for executemany-style parameters: a list of parameter sets."""
+    return (isinstance(params, list) and bool(params)
+            and all(isinstance(p, (tuple, list, dict)) for p in params))
+
+
 class ExecuteQuery:
     """
-    A reusable context manager that connects to a database, executes
-    a given query with parameters, and provides the cursor to fetch results.
+    A reusable context manager that checks out a pooled connection to a
+    database, executes a given query with parameters, and provides the
+    cursor to fetch results.
+
+    Pooled connections stay open between uses, so sqlite3's per-connection
+    prepared statement cache already holds the query the next time the
+    same SQL runs. A list of parameter tuples runs the query once per tuple
+    with `executemany`. Iterating the manager itself streams the rows in
+    chunks without building the full result list:
+
+        for row in ExecuteQuery(db_name, "SELECT * FROM users"):
+            ...
     """
-    def __init__(self, db_name, query, params=()):
+    def __init__(self, db_name, query, params=(), pool=None,
+                 chunk_size=CHUNK_SIZE, debug=True):
         """
         Initializes the context manager.
 
         Args:
             db_name (str): The name of the database file.
             query (str): The SQL query string to be executed.
-            params (tuple, optional): A tuple of parameters for the query.
+            params (tuple, optional): A tuple of parameters for the query,
+                                      or a list of such tuples to execute
+                                      the query for each of them.
                                       Defaults to an empty tuple.
+            pool (ConnectionPool, optional): The pool to check out from.
+                                             Defaults to the shared pool
+                                             for db_name.
+            chunk_size (int): Rows per fetch when iterating the manager.
+            debug (bool): Whether to log each executed query.
         """
         self.db_name = db_name
         self.query = query
         self.params = params
+        self.pool = pool if pool is not None else get_pool(db_name)
+        self.chunk_size = chunk_size
+        self.debug = debug
         self.conn = None
+        self.cursor = None
 
     def __enter__(self):
         """
         Called when entering the 'with' block.
-        Connects to the DB, creates a cursor, executes the query,
-        and returns the cursor.
+        Checks out a connection, executes the query and returns the cursor.
         """
+        self.conn = self.pool.acquire()
         try:
-            self.conn = sqlite3.connect(self.db_name)
-            cursor = self.conn.cursor()
-            print(f"LOG: Executing query: '{self.query}' with params {self.params}")
-            cursor.execute(self.query, self.params)
-            return cursor
-        except Exception as e:
-            # If an error happens during setup, close connection and re-raise
-            if self.conn:
-                self.conn.close()
-            raise e
+            self.cursor = self.conn.cursor()
+            if self.debug:
+                print(f"LOG: Executing query: '{self.query}' with params {self.params}")
+            if is_bulk(self.params):
+                self.cursor.executemany(self.query, self.params)
+            else:
+                self.cursor.execute(self.query, self.params)
+            return self.cursor
+        except Exception:
+            # If an error happens during setup, return the connection and re-raise
+            self._release(commit=False)
+            raise
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Called when exiting the 'with' block.
-        Ensures the database connection is closed.
+        Commits writes made by the query unless an exception occurred,
+        then returns the connection to the pool.
         """
         if self.conn:
-            self.conn.close()
-        
+            self._release(commit=exc_type is None)
+
         # We don't suppress exceptions
         return False
 
+    def _release(self, commit):
+        conn, self.conn, self.cursor = self.conn, None, None
+        try:
+            if commit and conn.in_transaction:
+                conn.commit()
+        finally:
+            # The pool rolls back anything left uncommitted
+            self.pool.release(conn)
+
+    def __iter__(self):
+        """
+        Yields the result rows `chunk_size` at a time. Outside a 'with'
+        block the query is executed first and the connection is returned
+        once the rows are exhausted or the iterator is closed.
+        """
+        entered = self.conn is None
+        cursor = self.__enter__() if entered else self.cursor
+        completed = False
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield from rows
+            completed = True
+        finally:
+            if entered and self.conn:
+                self._release(commit=completed)
+
+
 # --- Main execution block ---
 if __name__ == '__main__':
     # Ensure you have run setup_db.py first
@@ -80,7 +147,12 @@ if __name__ == '__main__':
                 print("No users found matching the criteria.")
         
         # __exit__ is automatically called here, closing the connection.
-        print("\n--- Context manager has finished and closed the connection. ---")
+        print("\n--- Context manager has finished and returned the connection. ---")
+
+        # Iterate the manager directly to stream rows in chunks
+        print("\nStreaming users older than 25:")
+        for row in ExecuteQuery(db_file, sql_query, age_param, debug=False):
+            print(row)
 
     except sqlite3.OperationalError as e:
         print(f"\nDatabase Error: {e}. Please run the setup_db.py script.")
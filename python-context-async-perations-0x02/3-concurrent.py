@@ -2,57 +2,622 @@
 """
 This module demonstrates how to run multiple database queries
 concurrently using asyncio and the aiosqlite library.
+
+Every aiosqlite connection runs on its own background thread, so the
+fetchers share a bounded AsyncConnectionPool instead of connecting per
+coroutine.
 """
+import os
+import re
+import sys
 import asyncio
+import inspect
+import weakref
 import aiosqlite
 import time
+from collections import deque
+from collections.abc import Mapping
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', '0x01-python_async_function'
+))
+benchmark_runtime = __import__('benchmark_runtime')
 
 DB_NAME = 'task_database.db'
 
-async def async_fetch_users():
+
+class AsyncConnectionPool:
     """
-    Asynchronously fetches all users from the database.
+    An asyncio pool of aiosqlite connections to one database.
+
+    At most `max_size` connections (and so background threads) exist at
+    once. Waiters are served strictly first come, first served: a returned
+    connection is handed to the longest waiting coroutine rather than to
+    whoever asks next. Connections idle for more than `idle_timeout`
+    seconds are closed by a timer, even without further traffic. A
+    transaction left open by a borrower is rolled back on return.
+    metrics() reports usage and wait times.
+
+        async with pool.acquire() as db:
+            ...
+    """
+    def __init__(self, db_name, max_size=10, idle_timeout=60.0):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = deque()     # (connection, time it was returned)
+        self._waiters = deque()  # futures resolved with a connection or None
+        self._size = 0
+        self._closed = False
+        self._evict_timer = None
+        self._evict_task = None
+        self._stats = {
+            'created': 0, 'evicted': 0, 'acquisitions': 0, 'waits': 0,
+            'total_wait_time': 0.0, 'max_wait_time': 0.0,
+        }
+
+    def metrics(self):
+        return {
+            **self._stats,
+            'size': self._size,
+            'idle': len(self._idle),
+            'in_use': self._size - len(self._idle),
+            'waiters': len(self._waiters),
+        }
+
+    async def _evict_idle(self):
+        """Closes the connections that have been idle the longest."""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            await conn.close()
+
+    def _schedule_eviction(self):
+        """Arms a timer for when the oldest idle connection expires."""
+        if self._evict_timer is not None or not self._idle or self._closed:
+            return
+        delay = self._idle[0][1] + self.idle_timeout - time.monotonic()
+        self._evict_timer = asyncio.get_running_loop().call_later(
+            max(0.0, delay), self._on_evict_timer
+        )
+
+    def _on_evict_timer(self):
+        self._evict_timer = None
+        self._evict_task = asyncio.ensure_future(self._evict_and_reschedule())
+
+    async def _evict_and_reschedule(self):
+        await self._evict_idle()
+        self._schedule_eviction()
+
+    async def _connect(self):
+        try:
+            conn = await aiosqlite.connect(self.db_name)
+        except BaseException:
+            # Give the reserved slot to the next waiter
+            self._checkin(None)
+            raise
+        self._stats['created'] += 1
+        return conn
+
+    def _hand_over(self, conn):
+        """Passes conn to the first live waiter. Returns False if none."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return True
+        return False
+
+    async def _checkout(self):
+        if self._closed:
+            raise RuntimeError("the connection pool is closed")
+        self._stats['acquisitions'] += 1
+        await self._evict_idle()
+        if self._idle and not self._waiters:
+            return self._idle.pop()[0]
+        if self._size < self.max_size and not self._waiters:
+            self._size += 1
+            return await self._connect()
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            conn = await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._checkin(waiter.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        waited = time.monotonic() - start
+        self._stats['waits'] += 1
+        self._stats['total_wait_time'] += waited
+        self._stats['max_wait_time'] = max(self._stats['max_wait_time'], waited)
+        if conn is None:
+            return await self._connect()
+        return conn
+
+    def _checkin(self, conn):
+        if conn is None:
+            # A slot was freed without a connection; a waiter handed None
+            # takes over the slot and connects itself
+            self._size -= 1
+            if self._hand_over(None):
+                self._size += 1
+            return
+        if not self._hand_over(conn):
+            self._idle.append((conn, time.monotonic()))
+            self._schedule_eviction()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Checks out a connection for the duration of an `async with`."""
+        conn = await self._checkout()
+        try:
+            yield conn
+        finally:
+            # Do not hand an open transaction to the next user, whether the
+            # block failed or just left implicit DML uncommitted
+            healthy = True
+            if conn.in_transaction:
+                try:
+                    await conn.rollback()
+                except Exception:
+                    healthy = False
+            if self._closed or not healthy:
+                try:
+                    await conn.close()
+                finally:
+                    if self._closed:
+                        self._size -= 1
+                    else:
+                        self._checkin(None)
+            else:
+                self._checkin(conn)
+
+    async def close(self):
+        """Closes the idle connections; busy ones close when returned."""
+        self._closed = True
+        if self._evict_timer is not None:
+            self._evict_timer.cancel()
+            self._evict_timer = None
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            await conn.close()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("the connection pool is closed"))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+
+# The default pool of each running event loop
+_default_pools = weakref.WeakKeyDictionary()
+
+
+def get_pool():
+    """Returns the default AsyncConnectionPool for the running event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _default_pools.get(loop)
+    if pool is None or pool._closed:
+        pool = _default_pools[loop] = AsyncConnectionPool(DB_NAME)
+    return pool
+
+
+# Rows fetched per fetchmany() call when streaming
+STREAM_CHUNK_SIZE = 500
+
+
+async def stream_rows(cursor, chunk_size=STREAM_CHUNK_SIZE):
+    """Yields an aiosqlite cursor's rows, fetched `chunk_size` at a time."""
+    while True:
+        rows = await cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+async def stream_query(query, params=(), chunk_size=STREAM_CHUNK_SIZE,
+                       pool=None):
+    """
+    Runs a query on a pooled connection and yields its rows in chunks.
+    The connection is held until the generator is exhausted or closed.
+    """
+    pool = pool or get_pool()
+    async with pool.acquire() as db:
+        async with db.execute(query, params) as cursor:
+            async for row in stream_rows(cursor, chunk_size):
+                yield row
+
+
+async def _resolve(value):
+    """Awaits value if it is awaitable, so stages may be sync or async."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class AsyncPipeline:
+    """
+    Chains filter/map stages over an async iterable of rows and reduces it
+    with aggregate/count/collect. Rows flow through one at a time, so only
+    the current chunk (plus `concurrency` mapped items) is held in memory.
+
+        total_age = await (
+            AsyncPipeline(stream_query("SELECT * FROM users"))
+            .filter(lambda row: row[3] > 40)
+            .map(lambda row: row[3])
+            .aggregate(lambda total, age: total + age, 0)
+        )
+
+    Stage functions may be plain functions or coroutine functions.
+    """
+    def __init__(self, source):
+        self._source = source
+
+    def __aiter__(self):
+        return self._source.__aiter__()
+
+    def filter(self, predicate):
+        async def stage(source):
+            async for item in source:
+                if await _resolve(predicate(item)):
+                    yield item
+        return AsyncPipeline(stage(self._source))
+
+    def map(self, func, concurrency=1):
+        """
+        Applies func to every item. With concurrency > 1, up to that many
+        calls run at once (useful for async funcs); order is preserved.
+        """
+        async def stage(source):
+            async for item in source:
+                yield await _resolve(func(item))
+
+        async def concurrent_stage(source):
+            pending = deque()
+            try:
+                async for item in source:
+                    pending.append(asyncio.ensure_future(_resolve(func(item))))
+                    if len(pending) >= concurrency:
+                        yield await pending.popleft()
+                while pending:
+                    yield await pending.popleft()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        if concurrency > 1:
+            return AsyncPipeline(concurrent_stage(self._source))
+        return AsyncPipeline(stage(self._source))
+
+    async def aggregate(self, func, initial):
+        accumulator = initial
+        async for item in self:
+            accumulator = await _resolve(func(accumulator, item))
+        return accumulator
+
+    async def count(self):
+        return await self.aggregate(lambda total, _: total + 1, 0)
+
+    async def collect(self):
+        return [item async for item in self]
+
+
+_SIMPLE_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+\*\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_UNSHAREABLE_RE = re.compile(
+    r"\b(SELECT|ORDER|GROUP|LIMIT|OFFSET|HAVING|UNION)\b", re.IGNORECASE
+)
+# Numbered (?1) and named (:a, @a, $a) placeholders cannot be concatenated
+_NON_POSITIONAL_PARAM_RE = re.compile(r"\?\d|[:@$][A-Za-z_]")
+
+
+def _shareable(predicate, params):
+    """
+    True if predicate's parameters can be appended positionally to other
+    predicates': params is a plain sequence matching its bare `?` marks.
+    """
+    if isinstance(params, (Mapping, str, bytes)):
+        return False
+    if not predicate:
+        return len(params) == 0
+    return (not _UNSHAREABLE_RE.search(predicate)
+            and not _NON_POSITIONAL_PARAM_RE.search(predicate)
+            and predicate.count('?') == len(params))
+
+
+class SharedScanBatcher:
+    """
+    Serves concurrent `SELECT * FROM <table> [WHERE <predicate>]` queries
+    on the same table from a single scan.
+
+    Queries arriving within `window` seconds of the first one for a table
+    are combined into one statement that projects each predicate as a
+    flag column:
+
+        SELECT *, CASE WHEN (age > ?) THEN 1 ELSE 0 END, ... FROM users
+
+    Each row is then delivered to every query whose flag is set, so SQLite
+    itself evaluates the predicates with its usual semantics. Anything
+    more complex (ORDER BY, LIMIT, subqueries, ...), and any query whose
+    parameters are not a sequence bound to plain `?` marks (e.g. `?1`,
+    `:name` or dict params), runs on its own.
+    """
+    def __init__(self, pool=None, window=0.005):
+        self.pool = pool
+        self.window = window
+        self.scans = 0
+        self.queries = 0
+        self._batches = {}  # table -> [(predicate, params, future)]
+
+    async def query(self, sql, params=()):
+        """Runs sql, sharing a scan with concurrent queries when possible."""
+        self.queries += 1
+        pool = self.pool or get_pool()
+        match = _SIMPLE_SELECT_RE.match(sql)
+        predicate = match and match.group(2)
+        if not match or not _shareable(predicate, params):
+            self.scans += 1
+            async with pool.acquire() as db:
+                async with db.execute(sql, params) as cursor:
+                    return [row async for row in stream_rows(cursor)]
+
+        table = match.group(1)
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batches.get(table)
+        if batch is None:
+            batch = self._batches[table] = []
+            asyncio.get_running_loop().call_later(
+                self.window,
+                lambda: asyncio.ensure_future(self._scan(pool, table))
+            )
+        batch.append((predicate, tuple(params), future))
+        return await future
+
+    async def _scan(self, pool, table):
+        batch = self._batches.pop(table)
+        self.scans += 1
+        flags, params = [], []
+        for predicate, query_params, _ in batch:
+            flags.append(f"CASE WHEN ({predicate}) THEN 1 ELSE 0 END"
+                         if predicate else "1")
+            params.extend(query_params)
+        sql = f"SELECT *, {', '.join(flags)} FROM {table}"
+        results = [[] for _ in batch]
+        try:
+            async with pool.acquire() as db:
+                async with db.execute(sql, params) as cursor:
+                    width = len(cursor.description) - len(batch)
+                    async for row in stream_rows(cursor):
+                        data = row[:width]
+                        for i, flag in enumerate(row[width:]):
+                            if flag:
+                                results[i].append(data)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), rows in zip(batch, results):
+            if not future.done():
+                future.set_result(rows)
+
+
+async def async_fetch_users(pool=None):
+    """
+    Asynchronously fetches all users from the database, using a pooled
+    connection (the loop's default pool unless one is given).
     """
     print("Task 1: Starting to fetch all users...")
-    async with aiosqlite.connect(DB_NAME) as db:
+    pool = pool or get_pool()
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users") as cursor:
-            result = await cursor.fetchall()
+            result = [row async for row in stream_rows(cursor)]
             # Simulate a slow network or I/O operation
             await asyncio.sleep(1)
             print("Task 1: Finished fetching all users.")
             return result
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(pool=None):
     """
-    Asynchronously fetches users older than 40.
+    Asynchronously fetches users older than 40, using a pooled connection
+    (the loop's default pool unless one is given).
     """
     print("Task 2: Starting to fetch older users...")
-    async with aiosqlite.connect(DB_NAME) as db:
+    pool = pool or get_pool()
+    async with pool.acquire() as db:
         async with db.execute("SELECT * FROM users WHERE age > ?", (40,)) as cursor:
-            result = await cursor.fetchall()
+            result = [row async for row in stream_rows(cursor)]
             # Simulate another slow network or I/O operation
             await asyncio.sleep(1)
             print("Task 2: Finished fetching older users.")
             return result
 
+class QueryOutcome:
+    """The result of one query of a fan_out: rows, or the error it hit."""
+    __slots__ = ('index', 'params', 'rows', 'error')
+
+    def __init__(self, index, params, rows=None, error=None):
+        self.index = index
+        self.params = params
+        self.rows = rows
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = f"{len(self.rows)} rows" if self.ok else repr(self.error)
+        return f"QueryOutcome(#{self.index} {self.params!r}: {status})"
+
+
+async def _run_query(pool, query, params, timeout):
+    async def run():
+        async with pool.acquire() as db:
+            async with db.execute(query, params) as cursor:
+                return await cursor.fetchall()
+    if timeout is None:
+        return await run()
+    return await asyncio.wait_for(run(), timeout)
+
+
+async def fan_out(query, param_sets, concurrency=10, timeout=None,
+                  deadline=None, pool=None):
+    """
+    Runs `query` once per parameter set with at most `concurrency` queries
+    in flight, yielding a QueryOutcome for each as soon as it completes.
+
+    Args:
+        query (str): The parameterized SQL to run.
+        param_sets: An iterable or async iterable of parameter tuples; it
+                    is consumed lazily, so it may be very long.
+        concurrency (int): Maximum number of queries running at once.
+        timeout (float, optional): Per-query timeout in seconds; a query
+                                   that exceeds it yields an outcome whose
+                                   error is a TimeoutError. (aiosqlite
+                                   finishes the statement in its thread
+                                   before the connection is reused.)
+        deadline (float, optional): Time budget in seconds for the whole
+                                    fan-out. When it runs out, queries still
+                                    running are cancelled and yielded with a
+                                    CancelledError, and no new ones start.
+        pool (AsyncConnectionPool, optional): Defaults to the loop's pool.
+
+    A failing query never stops the others. Closing the generator early
+    cancels the queries still in flight.
+    """
+    pool = pool or get_pool()
+    end = object()
+    stop_at = None if deadline is None else time.monotonic() + deadline
+    if hasattr(param_sets, '__aiter__'):
+        params_iter = param_sets.__aiter__()
+
+        async def next_params(left):
+            # A slow async source must not hold the fan-out past its deadline
+            try:
+                return await asyncio.wait_for(params_iter.__anext__(), left)
+            except (StopAsyncIteration, asyncio.TimeoutError):
+                return end
+    else:
+        params_iter = iter(param_sets)
+
+        async def next_params(left):
+            return next(params_iter, end)
+
+    running = {}  # task -> (index, params)
+    index = 0
+    more = True
+    try:
+        while more or running:
+            while more and len(running) < concurrency:
+                left = None if stop_at is None else stop_at - time.monotonic()
+                if left is not None and left <= 0:
+                    more = False
+                    break
+                params = await next_params(left)
+                if params is end:
+                    more = False
+                    break
+                task = asyncio.ensure_future(_run_query(pool, query, params, timeout))
+                running[task] = (index, params)
+                index += 1
+            if not running:
+                break
+
+            wait_for = None if stop_at is None else max(0, stop_at - time.monotonic())
+            done, _ = await asyncio.wait(
+                running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # Deadline reached: cancel the stragglers and report them
+                more = False
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                done = set(running)
+
+            for task in done:
+                i, params = running.pop(task)
+                if task.cancelled():
+                    yield QueryOutcome(i, params, error=asyncio.CancelledError())
+                elif task.exception() is not None:
+                    yield QueryOutcome(i, params, error=task.exception())
+                else:
+                    yield QueryOutcome(i, params, rows=task.result())
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+async def fan_out_report(query, param_sets, **options):
+    """
+    Collects a whole fan_out into a report of successes and failures:
+    {'results': {index: rows}, 'failures': {index: (params, error)}}.
+    """
+    report = {'results': {}, 'failures': {}}
+    async for outcome in fan_out(query, param_sets, **options):
+        if outcome.ok:
+            report['results'][outcome.index] = outcome.rows
+        else:
+            report['failures'][outcome.index] = (outcome.params, outcome.error)
+    return report
+
+
+async def benchmark_fan_out(n=2000, limits=(1, 2, 4, 8, 16, 32)):
+    """
+    Measures fan_out throughput (queries/sec) for n point lookups at each
+    concurrency limit, with a pool sized to match the limit.
+    """
+    results = {}
+    for limit in limits:
+        async with AsyncConnectionPool(DB_NAME, max_size=limit) as pool:
+            params = ((i % 100,) for i in range(n))
+            start = time.perf_counter()
+            async for _ in fan_out("SELECT * FROM users WHERE id = ?", params,
+                                   concurrency=limit, pool=pool):
+                pass
+            results[limit] = n / (time.perf_counter() - start)
+    return results
+
+
 async def fetch_concurrently():
     """
     Runs the two fetch functions concurrently using asyncio.gather.
     """
     print("--- Starting concurrent execution ---")
-    start_time = time.time()
-    
-    # Create a list of the coroutine tasks to run
-    tasks = [
-        async_fetch_users(),
-        async_fetch_older_users()
-    ]
-    
-    # asyncio.gather runs all tasks concurrently and waits for them to complete
-    results = await asyncio.gather(*tasks)
-    
-    end_time = time.time()
-    print(f"\n--- Concurrent execution finished in {end_time - start_time:.2f} seconds ---")
+    with benchmark_runtime.Timer() as timer:
+        # Create a list of the coroutine tasks to run
+        tasks = [
+            async_fetch_users(),
+            async_fetch_older_users()
+        ]
+
+        # asyncio.gather runs all tasks concurrently and waits for them to complete
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            await get_pool().close()
+
+    print(f"\n--- Concurrent execution finished in {timer.elapsed:.4f} seconds ---")
     
     # results will be a list containing the return values of the tasks
     all_users = results[0]
@@ -69,3 +634,33 @@ if __name__ == '__main__':
     # asyncio.run() starts the asyncio event loop and runs the main coroutine
     asyncio.run(fetch_concurrently())
 
+    # Serve both of the fetchers' queries from a single table scan
+    async def shared_scan():
+        batcher = SharedScanBatcher()
+        all_users, older_users = await asyncio.gather(
+            batcher.query("SELECT * FROM users"),
+            batcher.query("SELECT * FROM users WHERE age > ?", (40,)),
+        )
+        await get_pool().close()
+        return len(all_users), len(older_users), batcher.scans
+    print("\nShared scan: {} users, {} older than 40, {} scan(s)".format(
+        *asyncio.run(shared_scan())
+    ))
+
+    # Aggregate a whole table with bounded memory by streaming it
+    async def average_age():
+        ages = AsyncPipeline(stream_query("SELECT age FROM users")).map(
+            lambda row: row[0]
+        )
+        count, total = await ages.aggregate(
+            lambda acc, age: (acc[0] + 1, acc[1] + age), (0, 0)
+        )
+        await get_pool().close()
+        return total / count if count else 0.0
+    print(f"\nAverage user age (streamed): {asyncio.run(average_age()):.1f}")
+
+    # Optional: throughput of fan_out at different concurrency limits
+    if '--bench' in sys.argv:
+        for limit, rate in asyncio.run(benchmark_fan_out()).items():
+            print(f"concurrency {limit:>3}: {rate:,.0f} queries/sec")
+
@@ -0,0 +1,315 @@
+#!/usr/bin/python3
+"""
+This module provides async counterparts of DatabaseConnection and
+ExecuteQuery for use inside asyncio code.
+
+Blocking sqlite3 calls run on a small, bounded set of worker threads
+("lanes"), each owning its own connection, so the event loop keeps
+running while queries execute. Everything inside one `async with` block
+runs on the same lane, and therefore on the same connection, so
+transactions behave as they do with the sync context managers.
+"""
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', '0x01-python_async_function'
+))
+benchmark_runtime = __import__('benchmark_runtime')
+
+
+class _Lane:
+    """A single worker thread with its own sqlite3 connection."""
+    def __init__(self, db_name, name):
+        self.db_name = db_name
+        self.conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def _call(self, func, args):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_name)
+        return func(self.conn, *args)
+
+    async def run(self, func, *args):
+        """Runs func(conn, *args) on this lane's thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args)
+
+    def close(self):
+        def close_conn():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        self._executor.submit(close_conn).result()
+        self._executor.shutdown()
+
+
+class SqliteThreadPool:
+    """
+    A bounded pool of `max_workers` lanes for one database. A lane is
+    checked out for the duration of an async context manager block;
+    waiters are served in arrival order.
+    """
+    def __init__(self, db_name, max_workers=4):
+        self.db_name = db_name
+        self._lanes = [_Lane(db_name, f"sqlite-{i}") for i in range(max_workers)]
+        self._free = deque(self._lanes)
+        self._waiters = deque()
+
+    async def checkout(self):
+        if self._free and not self._waiters:
+            return self._free.popleft()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.checkin(waiter.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def checkin(self, lane):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(lane)
+                return
+        self._free.append(lane)
+
+    def close(self):
+        """Closes every lane's connection and stops its thread."""
+        for lane in self._lanes:
+            lane.close()
+
+
+# One shared thread pool per database file
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_thread_pool(db_name, max_workers=4):
+    """Returns the shared SqliteThreadPool for db_name."""
+    with _pools_lock:
+        if db_name not in _pools:
+            _pools[db_name] = SqliteThreadPool(db_name, max_workers)
+        return _pools[db_name]
+
+
+class AsyncCursor:
+    """An awaitable view of a sqlite3 cursor living on a lane's thread."""
+    def __init__(self, lane, cursor):
+        self._lane = lane
+        self._cursor = cursor
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    async def fetchone(self):
+        return await self._lane.run(lambda _: self._cursor.fetchone())
+
+    async def fetchmany(self, size):
+        return await self._lane.run(lambda _: self._cursor.fetchmany(size))
+
+    async def fetchall(self):
+        return await self._lane.run(lambda _: self._cursor.fetchall())
+
+    async def __aiter__(self):
+        while True:
+            rows = await self.fetchmany(500)
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+
+class AsyncConnection:
+    """The object bound by `async with AsyncDatabaseConnection(...) as conn`."""
+    def __init__(self, lane):
+        self._lane = lane
+
+    async def execute(self, query, params=()):
+        cursor = await self._lane.run(lambda conn: conn.execute(query, params))
+        return AsyncCursor(self._lane, cursor)
+
+    async def executemany(self, query, seq_of_params):
+        cursor = await self._lane.run(
+            lambda conn: conn.executemany(query, seq_of_params)
+        )
+        return AsyncCursor(self._lane, cursor)
+
+    async def commit(self):
+        await self._lane.run(lambda conn: conn.commit())
+
+    async def rollback(self):
+        await self._lane.run(lambda conn: conn.rollback())
+
+    async def run(self, func, *args):
+        """Runs func(conn, *args) with the raw sqlite3 connection."""
+        return await self._lane.run(func, *args)
+
+
+def _discard_open_transaction(conn):
+    if conn.in_transaction:
+        conn.rollback()
+
+
+class AsyncDatabaseConnection:
+    """
+    An async context manager for SQLite database connections whose
+    operations run on a bounded thread pool instead of the event loop.
+    Like DatabaseConnection, work that is not committed inside the block
+    is discarded when it exits.
+    """
+    def __init__(self, db_name, pool=None):
+        self.db_name = db_name
+        self.pool = pool if pool is not None else get_thread_pool(db_name)
+        self.lane = None
+
+    async def __aenter__(self):
+        self.lane = await self.pool.checkout()
+        return AsyncConnection(self.lane)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        lane, self.lane = self.lane, None
+        try:
+            await lane.run(_discard_open_transaction)
+        finally:
+            self.pool.checkin(lane)
+        return False
+
+
+class AsyncExecuteQuery:
+    """
+    An async context manager that executes a given query with parameters
+    on the thread pool and provides an AsyncCursor to fetch the results.
+    Writes are committed when the block exits without an exception.
+    """
+    def __init__(self, db_name, query, params=(), pool=None):
+        self.db_name = db_name
+        self.query = query
+        self.params = params
+        self.pool = pool if pool is not None else get_thread_pool(db_name)
+        self.lane = None
+
+    async def __aenter__(self):
+        self.lane = await self.pool.checkout()
+        try:
+            cursor = await self.lane.run(
+                lambda conn: conn.execute(self.query, self.params)
+            )
+        except BaseException:
+            self.pool.checkin(self.lane)
+            self.lane = None
+            raise
+        return AsyncCursor(self.lane, cursor)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        lane, self.lane = self.lane, None
+
+        def finish(conn):
+            if exc_type is None and conn.in_transaction:
+                conn.commit()
+            _discard_open_transaction(conn)
+        try:
+            await lane.run(finish)
+        finally:
+            self.pool.checkin(lane)
+        return False
+
+
+async def benchmark_loop_latency(db_name, n=2000, concurrency=8):
+    """
+    Runs n point lookups `concurrency` at a time through each approach
+    while sampling event-loop lag, and returns for each approach the
+    elapsed seconds and the p50/p99/max lag in milliseconds:
+
+        blocking    sqlite3 called directly on the event loop (reference)
+        thread_pool AsyncExecuteQuery on the bounded thread pool
+        aiosqlite   direct aiosqlite connections (if installed)
+    """
+    sql = "SELECT * FROM users WHERE id = ?"
+
+    async def blocking_worker(ids):
+        conn = sqlite3.connect(db_name)
+        for i in ids:
+            conn.execute(sql, (i,)).fetchall()
+        conn.close()
+
+    async def thread_pool_worker(ids):
+        for i in ids:
+            async with AsyncExecuteQuery(db_name, sql, (i,)) as cursor:
+                await cursor.fetchall()
+
+    async def aiosqlite_worker(ids):
+        import aiosqlite
+        async with aiosqlite.connect(db_name) as db:
+            for i in ids:
+                async with db.execute(sql, (i,)) as cursor:
+                    await cursor.fetchall()
+
+    approaches = {
+        'blocking': blocking_worker,
+        'thread_pool': thread_pool_worker,
+        'aiosqlite': aiosqlite_worker,
+    }
+    results = {}
+    for name, worker in approaches.items():
+        stop = asyncio.Event()
+        lags = []
+        sampler = asyncio.ensure_future(
+            benchmark_runtime.sample_loop_lag(stop, lags)
+        )
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                worker(range(k, n, concurrency)) for k in range(concurrency)
+            ))
+        except ImportError:
+            stop.set()
+            await sampler
+            continue
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+        lag = benchmark_runtime.summarize(lags)
+        results[name] = {
+            'seconds': round(elapsed, 3),
+            'p50_lag_ms': round(lag.p50 / 1e6, 3),
+            'p99_lag_ms': round(lag.p99 / 1e6, 3),
+            'max_lag_ms': round(lag.maximum / 1e6, 3),
+        }
+    return results
+
+
+# --- Main execution block ---
+if __name__ == '__main__':
+    # Ensure you have run setup_db.py first
+    db_file = 'task_database.db'
+
+    async def main():
+        async with AsyncDatabaseConnection(db_file) as conn:
+            cursor = await conn.execute("SELECT * FROM users")
+            print("All users:", await cursor.fetchall())
+
+        async with AsyncExecuteQuery(db_file, "SELECT * FROM users WHERE age > ?", (25,)) as cursor:
+            print("Users older than 25:", await cursor.fetchall())
+
+        for name, stats in (await benchmark_loop_latency(db_file)).items():
+            print(f"{name:<12} {stats}")
+
+    asyncio.run(main())
+    get_thread_pool(db_file).close()
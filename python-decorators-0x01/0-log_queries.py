@@ -1,40 +1,319 @@
 #!/usr/bin/python3
 """
-This module demonstrates a simple Python decorator to log SQL queries
-with a timestamp, as required by the checker.
+This module demonstrates a Python decorator to log SQL queries, as
+required by the checker.
+
+Queries are logged as structured JSON records (SQL fingerprint, duration,
+rows returned, error) through a non-blocking queue handler, so the caller
+never waits on terminal or file I/O. Ordinary queries are sampled; slow
+queries and failures are always logged with the full SQL text. Every
+query is also aggregated into `query_stats` for a per-fingerprint view of
+call counts and latency percentiles.
 """
+import re
+import json
+import math
+import time
+import queue
+import random
+import atexit
 import sqlite3
+import inspect
+import logging
+import threading
 import functools
-from datetime import datetime 
+import logging.handlers
+
+# Queries at least this slow (milliseconds) are always logged in full
+SLOW_QUERY_MS = 100.0
+# Fraction of ordinary (fast, successful) queries that are logged
+SAMPLE_RATE = 1.0
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Normalizes a SQL string so that queries differing only by literal
+    values share one fingerprint, e.g.
+    "SELECT * FROM users WHERE id = 7" -> "SELECT * FROM users WHERE id = ?".
+    """
+    fp = _STRING_LITERAL_RE.sub('?', query)
+    fp = _NUMBER_LITERAL_RE.sub('?', fp)
+    fp = _IN_LIST_RE.sub('IN (...)', fp)
+    return _WHITESPACE_RE.sub(' ', fp).strip()
+
+
+class JsonFormatter(logging.Formatter):
+    """Renders the `query_stats` attached to a record as one JSON line."""
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+        }
+        payload.update(getattr(record, 'query_stats', {}))
+        return json.dumps(payload, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that hands the raw record to the listener thread.
+    The stock handler formats the message in the calling thread; here all
+    formatting is deferred to the listener, off the query path.
+    """
+    def prepare(self, record):
+        return record
+
+
+def _build_logger():
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    query_logger = logging.getLogger('queries')
+    query_logger.setLevel(logging.INFO)
+    query_logger.addHandler(_DeferredQueueHandler(log_queue))
+    query_logger.propagate = False
+    return query_logger
+
+
+logger = _build_logger()
+
+
+class LatencyHistogram:
+    """
+    A streaming log-bucketed histogram of latencies in milliseconds.
+
+    Each bucket is GROWTH times wider than the previous one, so memory is
+    bounded by the latency range rather than the number of samples and any
+    percentile is reported with at most (GROWTH - 1) relative error.
+    """
+    GROWTH = 1.05
+    MIN_MS = 0.001
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._log_growth = math.log(self.GROWTH)
+
+    def add(self, value_ms):
+        index = 0
+        if value_ms > self.MIN_MS:
+            index = int(math.log(value_ms / self.MIN_MS) / self._log_growth)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def percentile(self, pct):
+        """Returns the upper bound of the bucket holding the pct-th sample."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                upper = self.MIN_MS * self.GROWTH ** (index + 1)
+                return min(upper, self.max)
+        return self.max
+
+
+class QueryStats:
+    """
+    An in-process aggregator of query executions keyed by SQL fingerprint,
+    in the spirit of pg_stat_statements.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reporter = None
+
+    def record(self, query, func_name, duration_ms, rows, error):
+        key = fingerprint(query) if query else '<unknown>'
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'calls': 0, 'errors': 0, 'rows': 0, 'total_ms': 0.0,
+                    'functions': set(), 'histogram': LatencyHistogram(),
+                }
+            entry['calls'] += 1
+            entry['rows'] += rows
+            entry['total_ms'] += duration_ms
+            entry['functions'].add(func_name)
+            entry['histogram'].add(duration_ms)
+            if error is not None:
+                entry['errors'] += 1
+
+    def snapshot(self):
+        """Returns per-fingerprint statistics, most total time first."""
+        with self._lock:
+            rows = []
+            for key, entry in self._entries.items():
+                hist = entry['histogram']
+                rows.append({
+                    'fingerprint': key,
+                    'functions': sorted(entry['functions']),
+                    'calls': entry['calls'],
+                    'errors': entry['errors'],
+                    'rows': entry['rows'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'mean_ms': round(entry['total_ms'] / entry['calls'], 3),
+                    'p50_ms': round(hist.percentile(50), 3),
+                    'p95_ms': round(hist.percentile(95), 3),
+                    'p99_ms': round(hist.percentile(99), 3),
+                    'max_ms': round(hist.max, 3),
+                })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def dump(self):
+        """Returns the current statistics as a JSON string."""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def start_reporter(self, interval=60.0):
+        """
+        Logs the statistics through the query logger every `interval`
+        seconds from a daemon thread. Call stop_reporter() to end it.
+        """
+        if self._reporter is not None:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                logger.info('query_stats', extra={
+                    'query_stats': {'statements': self.snapshot()}
+                })
+
+        thread = threading.Thread(target=run, name='query-stats', daemon=True)
+        self._reporter = (thread, stop)
+        thread.start()
+
+    def stop_reporter(self):
+        if self._reporter is not None:
+            thread, stop = self._reporter
+            stop.set()
+            thread.join()
+            self._reporter = None
+
+
+# Aggregated statistics of every query that went through log_queries
+query_stats = QueryStats()
+
+
+def _find_query(args, kwargs):
+    """Returns the SQL string passed to the decorated function, if any."""
+    query = kwargs.get('query')
+    if query is None:
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    return query
+
+
+def _row_count(result):
+    """Counts rows for fetchall-style (list) and fetchone-style results."""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _emit(query, duration_ms, rows, error, slow_ms, sample_rate):
+    """Decides whether a finished query is worth logging and logs it."""
+    is_slow = duration_ms >= slow_ms
+    if error is None and not is_slow:
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return
+        level = logging.INFO
+    else:
+        level = logging.ERROR if error is not None else logging.WARNING
+    if not logger.isEnabledFor(level):
+        return
+
+    stats = {
+        'fingerprint': fingerprint(query) if query else None,
+        'duration_ms': round(duration_ms, 3),
+        'rows': rows,
+        'error': repr(error) if error is not None else None,
+    }
+    if level != logging.INFO:
+        # Interesting queries carry the exact SQL for diagnosis
+        stats['query'] = query
+        stats['slow'] = is_slow
+    logger.log(level, 'query', extra={'query_stats': stats})
+
 
 # --- decorator to log SQL queries ---
-def log_queries(func):
+def log_queries(func=None, *, slow_ms=None, sample_rate=None):
     """
-    A decorator that logs the SQL query string along with a timestamp
-    before executing the function.
+    A decorator that logs the SQL query executed by the function along
+    with its duration, number of rows returned and any error raised.
+
+    Can be used bare (@log_queries) or configured
+    (@log_queries(slow_ms=50, sample_rate=0.01)); unset options fall back
+    to SLOW_QUERY_MS and SAMPLE_RATE. Coroutine functions are awaited.
     """
+    if func is None:
+        return functools.partial(
+            log_queries, slow_ms=slow_ms, sample_rate=sample_rate
+        )
+
+    def settings():
+        return (SLOW_QUERY_MS if slow_ms is None else slow_ms,
+                SAMPLE_RATE if sample_rate is None else sample_rate)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = _find_query(args, kwargs)
+            error = result = None
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+                rows = _row_count(result)
+                query_stats.record(query, func.__qualname__, duration_ms,
+                                   rows, error)
+                _emit(query, duration_ms, rows, error, *settings())
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-       
-        
-       
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-       
-        query = None
-        if args:
-            query = args[0]
-        elif 'query' in kwargs:
-            query = kwargs['query']
-        
-        
-        if query:
-            print(f"[{timestamp}] LOG: Executing query: '{query}'")
-        else:
-            print(f"[{timestamp}] LOG: No query string found in arguments to log.")
-        
-        
-        return func(*args, **kwargs)
+        query = _find_query(args, kwargs)
+        error = result = None
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            rows = _row_count(result)
+            query_stats.record(query, func.__qualname__, duration_ms, rows,
+                               error)
+            _emit(query, duration_ms, rows, error, *settings())
     return wrapper
 
 @log_queries
@@ -59,3 +338,5 @@ if __name__ == '__main__':
     users = fetch_all_users("SELECT * FROM users")
     print("\nQuery has been executed. Results:")
     print(users)
+    print("\nQuery statistics:")
+    print(query_stats.dump())
@@ -1,37 +1,515 @@
-database connections, reducing boilerplate code.
+#!/usr/bin/python3
 """
+This module demonstrates a decorator that automatically handles opening
+and closing database connections, reducing boilerplate code.
+"""
+import re
+import time
 import sqlite3
+import inspect
 import functools
+import itertools
+import threading
+from collections import Counter, OrderedDict
+
+DB_NAME = 'users.db'
+
+# --- Helper from a previous task (required) ---
+fingerprint = __import__('0-log_queries').fingerprint
+
+# sqlite3's own default for the per-connection prepared statement cache
+DEFAULT_CACHED_STATEMENTS = 128
+# Upper bounds for the pool's statement tracking: distinct query
+# fingerprints remembered, and the cache size asked of sqlite3
+MAX_TRACKED_SQL = 256
+MAX_CACHED_STATEMENTS = 512
+
+
+class StatementCache:
+    """
+    Per-connection LRU of the SQL texts executed on a pooled connection,
+    sized like its `cached_statements`.
+
+    Because the connection stays open in the pool, sqlite3 finds an already
+    prepared statement in its own `cached_statements` cache instead of
+    re-parsing it. sqlite3 does not expose that cache, so `hits` and
+    `misses` count repeats of the same SQL text within this LRU, an
+    estimate of sqlite3's cache hits rather than a measurement of them.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._seen = OrderedDict()
+
+    def note(self, sql):
+        """Records one execution of sql; returns True on a repeat."""
+        if sql in self._seen:
+            self.hits += 1
+            self._seen.move_to_end(sql)
+            return True
+        self.misses += 1
+        self._seen[sql] = None
+        if len(self._seen) > self.size:
+            self._seen.popitem(last=False)
+        return False
+
+
+class StatementCursor(sqlite3.Cursor):
+    """
+    The cursor class of pooled connections: a plain sqlite3 cursor whose
+    executions are counted by the connection's StatementCache and pool.
+    """
+    def _note(self, sql):
+        self.connection.statements.note(sql)
+        self.connection.pool.note_statement(sql)
+
+    def execute(self, sql, params=()):
+        self._note(sql)
+        return super().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self._note(sql)
+        return super().executemany(sql, seq_of_params)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A pooled sqlite3 connection, created through `sqlite3.connect(...,
+    factory=PooledConnection)`. It is a real sqlite3.Connection (row_factory,
+    `with conn:` etc. behave as usual); its cursors are StatementCursors.
+    The pool sets `pool`, `cache_size` and `statements` after connecting.
+    """
+    def cursor(self, factory=StatementCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of warm sqlite3 connections for one database.
 
-def with_db_connection(func):
+    Connections are opened with a `cached_statements` size derived from the
+    number of distinct query fingerprints seen so far (bounded by
+    MAX_TRACKED_SQL and MAX_CACHED_STATEMENTS); a returned connection whose
+    cache has become too small is closed and replaced by a larger one.
+    A read_only pool opens its connections in SQLite's read-only mode.
+    """
+    def __init__(self, db_name, max_size=5, timeout=5.0, read_only=False):
+        self.db_name = db_name
+        self.read_only = read_only
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._distinct_sql = set()
+        self._retired = {'hits': 0, 'misses': 0}
+        self._all = []
+        self._cond = threading.Condition()
+
+    def note_statement(self, sql):
+        if len(self._distinct_sql) >= MAX_TRACKED_SQL:
+            return
+        fp = fingerprint(sql)
+        if fp not in self._distinct_sql:
+            with self._cond:
+                if len(self._distinct_sql) < MAX_TRACKED_SQL:
+                    self._distinct_sql.add(fp)
+
+    def cached_statements(self):
+        """
+        Statement cache size for new connections: twice the distinct
+        fingerprints seen, at least sqlite3's default and at most
+        MAX_CACHED_STATEMENTS.
+        """
+        return min(MAX_CACHED_STATEMENTS,
+                   max(DEFAULT_CACHED_STATEMENTS, 2 * len(self._distinct_sql)))
+
+    def _connect(self):
+        size = self.cached_statements()
+        # "file:" names are URIs, e.g. a shared in-memory database
+        is_uri = self.db_name.startswith('file:')
+        name, query_only = self.db_name, False
+        if self.read_only:
+            if not is_uri:
+                name = f"file:{self.db_name}?mode=ro"
+            elif 'mode=' in self.db_name.partition('?')[2]:
+                # mode=memory etc. cannot be combined with mode=ro
+                query_only = True
+            else:
+                separator = '&' if '?' in self.db_name else '?'
+                name = f"{self.db_name}{separator}mode=ro"
+        conn = sqlite3.connect(
+            name, uri=self.read_only or is_uri, factory=PooledConnection,
+            check_same_thread=False, cached_statements=size
+        )
+        conn.pool = self
+        conn.cache_size = size
+        conn.statements = StatementCache(size)
+        if query_only:
+            sqlite3.Connection.execute(conn, "PRAGMA query_only = ON")
+        return conn
+
+    def acquire(self):
+        """Checks out a connection, waiting up to `timeout` seconds."""
+        with self._cond:
+            deadline = time.monotonic() + self.timeout
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"no connection to '{self.db_name}' available "
+                        f"within {self.timeout} second(s)"
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn):
+        """
+        Returns a connection, discarding any uncommitted work and the
+        borrower's connection settings.
+        """
+        healthy = True
+        try:
+            # Drop any query deadline left by with_db_connection(timeout=...)
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+            conn.isolation_level = ''
+        except sqlite3.Error:
+            healthy = False
+        undersized = conn.cache_size < self.cached_statements()
+        with self._cond:
+            if healthy and not undersized:
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self._retired['hits'] += conn.statements.hits
+        self._retired['misses'] += conn.statements.misses
+        self._all.remove(conn)
+        self._size -= 1
+        conn.close()
+
+    def close(self):
+        """Closes every idle connection."""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        """Statement cache counters summed over all pool connections."""
+        with self._cond:
+            hits = self._retired['hits'] + sum(c.statements.hits for c in self._all)
+            misses = self._retired['misses'] + sum(c.statements.misses for c in self._all)
+            return {
+                'connections': self._size,
+                'idle': len(self._idle),
+                'distinct_sql': len(self._distinct_sql),
+                'cached_statements': self.cached_statements(),
+                'statement_hits': hits,
+                'statement_misses': misses,
+            }
+
+
+# One pool per (database file, read-only) pair, created on first use
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name=None, read_only=False):
+    """Returns the shared ConnectionPool for db_name (defaults to DB_NAME)."""
+    db_name = db_name or DB_NAME
+    with _pools_lock:
+        pool = _pools.get((db_name, read_only))
+        if pool is None:
+            pool = _pools[(db_name, read_only)] = ConnectionPool(
+                db_name, read_only=read_only
+            )
+        return pool
+
+
+# --- Read replica routing ---
+# Database files that serve reads. When empty, reads use read-only
+# connections to DB_NAME itself.
+REPLICAS = []
+# After a thread writes to the primary, its reads stay on the primary for
+# this many seconds so it always sees its own writes.
+STICKY_SECONDS = 2.0
+
+_READ_SQL_RE = re.compile(r"^\s*(SELECT|WITH|EXPLAIN)\b", re.IGNORECASE)
+_WRITE_SQL_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b",
+                           re.IGNORECASE)
+_replica_cycle = itertools.count()
+_session = threading.local()
+
+
+def is_read_query(sql):
+    """Infers from its text whether a SQL statement only reads."""
+    return bool(_READ_SQL_RE.match(sql)) and not _WRITE_SQL_RE.search(sql)
+
+
+def _find_sql(args, kwargs):
+    query = kwargs.get('query')
+    if query is None:
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    return query
+
+
+def _choose_pool(func, args, kwargs, read_only):
+    """
+    Picks the pool for one call. Transactional functions, writes and
+    anything that cannot be shown to be read-only go to the primary.
+    """
+    if getattr(func, 'is_transactional', False):
+        return get_pool()
+    if read_only is None:
+        sql = _find_sql(args, kwargs)
+        read_only = sql is not None and is_read_query(sql)
+    if not read_only:
+        return get_pool()
+    last_write = getattr(_session, 'last_write', None)
+    if last_write is not None and time.monotonic() - last_write < STICKY_SECONDS:
+        return get_pool()
+    replicas = REPLICAS or [DB_NAME]
+    replica = replicas[next(_replica_cycle) % len(replicas)]
+    return get_pool(replica, read_only=True)
+
+
+# --- Query timeouts ---
+# SQLite virtual machine instructions executed between two deadline checks
+PROGRESS_HANDLER_STEPS = 1000
+
+# Number of timed-out calls per decorated function (qualified name)
+query_timeouts = Counter()
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """
+    Raised when a query runs past its function's timeout. It subclasses
+    sqlite3.OperationalError, so retry_on_failure treats it as transient.
+    """
+
+
+def _deadline_handler(timeout):
+    """A progress handler that interrupts the query after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    return lambda: time.monotonic() > deadline
+
+
+def _as_timeout(func, timeout, error):
+    """Converts sqlite's 'interrupted' error into a QueryTimeoutError."""
+    if timeout is None or 'interrupt' not in str(error):
+        return error
+    query_timeouts[func.__qualname__] += 1
+    return QueryTimeoutError(
+        f"'{func.__name__}' exceeded its timeout of {timeout} second(s)"
+    )
+
+
+# Rows fetched per fetchmany() call in streaming mode
+STREAM_CHUNK_SIZE = 500
+
+
+class RowStream:
+    """
+    An iterator over a cursor's rows, fetched `chunk_size` at a time with
+    fetchmany(), that keeps its pooled connection checked out until the
+    rows are exhausted or the stream is closed (explicitly, by a `with`
+    block, or when it is garbage collected).
+
+    With a timeout, each fetchmany() gets its own deadline, so the time the
+    caller spends between chunks does not count against it; an expired
+    deadline closes the stream and raises QueryTimeoutError.
+    """
+    def __init__(self, cursor, pool, conn, chunk_size, func=None,
+                 timeout=None):
+        self._cursor = cursor
+        self._pool = pool
+        self._conn = conn
+        self._chunk_size = chunk_size
+        self._func = func
+        self._timeout = timeout
+        self._chunk = iter(())
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            row = next(self._chunk, None)
+            if row is not None:
+                return row
+            if self._conn is None:
+                raise StopIteration
+            rows = self._fetch()
+            if not rows:
+                self.close()
+                raise StopIteration
+            self._chunk = iter(rows)
+
+    def _fetch(self):
+        if self._timeout is None:
+            return self._cursor.fetchmany(self._chunk_size)
+        self._conn.set_progress_handler(
+            _deadline_handler(self._timeout), PROGRESS_HANDLER_STEPS
+        )
+        try:
+            return self._cursor.fetchmany(self._chunk_size)
+        except sqlite3.OperationalError as e:
+            error = _as_timeout(self._func, self._timeout, e)
+            self.close()
+            if error is e:
+                raise
+            raise error from e
+        finally:
+            if self._conn is not None:
+                self._conn.set_progress_handler(None, 0)
+
+    def close(self):
+        """Returns the connection to the pool; further iteration stops."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._chunk = iter(())
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        self.close()
+
+
+def with_db_connection(func=None, *, read_only=None, stream=False,
+                       chunk_size=None, timeout=None):
     """
     A decorator that handles the database connection lifecycle.
-    It opens a connection, passes it as the first argument ('conn') to the
-    decorated function, and ensures the connection is closed afterwards.
+    It checks out a pooled connection, passes it as the first argument
+    ('conn') to the decorated function, and ensures the connection is
+    returned to the pool (with uncommitted work rolled back) afterwards.
+    Pooled connections keep their prepared statements between calls.
+
+    Reads are routed to read replicas (see REPLICAS): pass read_only=True
+    to mark a function, or leave it unset to infer it from a SQL string
+    argument. Transactional functions always use the primary, and so do
+    a thread's reads for STICKY_SECONDS after it wrote to the primary.
+
+    With stream=True the function returns its executed cursor and the
+    caller gets a RowStream that fetches `chunk_size` rows at a time
+    (default STREAM_CHUNK_SIZE) instead of a fully materialised list;
+    a timeout then applies to the call and to each fetch separately.
+
+    With timeout set (seconds), a progress handler interrupts any query
+    still running past the deadline and the call raises QueryTimeoutError;
+    timeouts are counted per function in `query_timeouts`.
+
+    Coroutine functions receive an aiosqlite connection instead, so the
+    same decorator can be used in asyncio code without blocking the loop.
     """
+    if func is None:
+        return functools.partial(
+            with_db_connection, read_only=read_only, stream=stream,
+            chunk_size=chunk_size, timeout=timeout
+        )
+
+    if inspect.iscoroutinefunction(func):
+        import aiosqlite
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            conn = None
+            try:
+                conn = await aiosqlite.connect(DB_NAME)
+                if timeout is not None:
+                    await conn.set_progress_handler(
+                        _deadline_handler(timeout), PROGRESS_HANDLER_STEPS
+                    )
+                try:
+                    return await func(conn, *args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    error = _as_timeout(func, timeout, e)
+                    if error is e:
+                        raise
+                    raise error from e
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                raise
+            finally:
+                if conn:
+                    await conn.close()
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # The 'conn' object will be managed entirely within this wrapper.
         conn = None
+        pool = _choose_pool(func, args, kwargs, read_only)
         try:
-            # 1. Open the database connection
-            conn = sqlite3.connect('users.db')
-            
+            # 1. Check out a warm connection from the pool
+            conn = pool.acquire()
+            changes = conn.total_changes
+            if timeout is not None:
+                conn.set_progress_handler(
+                    _deadline_handler(timeout), PROGRESS_HANDLER_STEPS
+                )
+
             # 2. Call the original function, passing the connection
             #    object as the first positional argument.
-            result = func(conn, *args, **kwargs)
-            
-            # 4. Return the result from the original function
+            try:
+                result = func(conn, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                error = _as_timeout(func, timeout, e)
+                if error is e:
+                    raise
+                raise error from e
+
+            # 3. Remember writes for read-your-writes stickiness
+            if not pool.read_only and conn.total_changes != changes:
+                _session.last_write = time.monotonic()
+
+            # 4. Return the result from the original function; a stream
+            #    takes over the connection and releases it when done.
+            if stream:
+                if timeout is not None:
+                    conn.set_progress_handler(None, 0)
+                result = RowStream(result, pool, conn,
+                                   chunk_size or STREAM_CHUNK_SIZE,
+                                   func, timeout)
+                conn = None
             return result
         except Exception as e:
             # If any error occurs, print it and re-raise it.
             print(f"An error occurred: {e}")
             raise
         finally:
-            # 5. Ensure the connection is closed, no matter what.
+            # 5. Ensure the connection is returned, no matter what.
             if conn:
-                conn.close()
-                # print("LOG: Database connection closed.") # Optional log
+                pool.release(conn)
     return wrapper
 
 @with_db_connection
@@ -45,6 +523,16 @@ def get_user_by_id(conn, user_id):
     cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
     return cursor.fetchone()
 
+@with_db_connection(stream=True)
+def stream_all_users(conn):
+    """
+    Streams every user in chunks; the connection is held until the
+    returned RowStream is exhausted or closed.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor
+
 # --- Fetch user by ID with automatic connection handling ---
 if __name__ == '__main__':
     # Make sure you have run setup_db.py first
@@ -55,3 +543,13 @@ if __name__ == '__main__':
     print("\nFetching user with ID 99 (should not exist)...")
     user_not_found = get_user_by_id(user_id=99)
     print(user_not_found)
+
+    print("\nStreaming all users...")
+    with stream_all_users() as users:
+        for user in users:
+            print(user)
+
+    # Repeated calls reuse the pooled connection and its prepared statement
+    for user_id in range(1000):
+        get_user_by_id(user_id=user_id)
+    print(f"\nPool statistics: {get_pool().stats()}")
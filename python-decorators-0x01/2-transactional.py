@@ -3,28 +3,98 @@
 This module demonstrates decorators for connection and transaction
 management, ensuring data integrity during database operations.
 """
+import os
+import sys
+import time
 import sqlite3
+import inspect
+import tempfile
 import functools
 
-# --- Decorator from previous task (required) ---
-def with_db_connection(func):
+# --- Decorator from a previous task (required) ---
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+# Set to False to silence the per-transaction LOG lines (e.g. in benchmarks)
+VERBOSE = True
+
+# Nesting depth of transactional calls per connection, keyed by id(conn).
+# Only the outermost call commits; inner calls run inside SAVEPOINTs.
+_tx_depth = {}
+# Active CommitBatch per connection, keyed by id(conn)
+_tx_batches = {}
+
+
+def _log(message):
+    if VERBOSE:
+        print(message)
+
+
+class CommitBatch:
     """
-    Decorator to handle the database connection lifecycle.
+    Groups many outermost transactional calls on one connection into a
+    single commit, which is flushed every `max_calls` calls or once
+    `max_seconds` have passed since the last commit, and when the block
+    exits. Each call still runs in its own SAVEPOINT, so a failing call is
+    undone on its own without losing the rest of the batch.
+
+        with CommitBatch(conn, max_calls=1000):
+            for user_id, email in changes:
+                set_email(conn, user_id, email)
+
+    Leaving the block with an exception rolls back the uncommitted tail.
     """
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = None
-        try:
-            conn = sqlite3.connect('users.db')
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            print(f"An error occurred in the connection wrapper: {e}")
-            raise
-        finally:
-            if conn:
-                conn.close()
-    return wrapper
+    def __init__(self, conn, max_calls=1000, max_seconds=1.0):
+        self.conn = conn
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.pending = 0
+        self.commits = 0
+        self._last_commit = time.monotonic()
+
+    def _record(self):
+        """Counts one finished call; returns True if a commit is due."""
+        self.pending += 1
+        return (self.pending >= self.max_calls
+                or time.monotonic() - self._last_commit >= self.max_seconds)
+
+    def _committed(self):
+        self.pending = 0
+        self.commits += 1
+        self._last_commit = time.monotonic()
+
+    def flush(self):
+        if self.pending:
+            self.conn.commit()
+            self._committed()
+
+    async def async_flush(self):
+        if self.pending:
+            await self.conn.commit()
+            self._committed()
+
+    def __enter__(self):
+        _tx_batches[id(self.conn)] = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        del _tx_batches[id(self.conn)]
+        if exc_type is None:
+            self.flush()
+        else:
+            self.conn.rollback()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        del _tx_batches[id(self.conn)]
+        if exc_type is None:
+            await self.async_flush()
+        else:
+            await self.conn.rollback()
+        return False
+
 
 # --- New decorator for this task ---
 def transactional(func):
@@ -32,29 +102,145 @@ def transactional(func):
     A decorator that wraps a function in a database transaction.
     It commits the transaction if the function executes successfully,
     and rolls back if any exception occurs.
+
+    Transactions nest: when a transactional function calls another one on
+    the same connection, only the outermost call commits and the inner
+    call runs inside a SAVEPOINT that is released on success or rolled
+    back to on failure. Inside a CommitBatch, commits are grouped.
+
+    Coroutine functions are awaited and committed through the async
+    (aiosqlite) connection supplied by with_db_connection.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            key = id(conn)
+            depth = _tx_depth.get(key, 0)
+            batch = _tx_batches.get(key)
+            savepoint = f"tx_{depth}" if depth or batch else None
+            if not conn.in_transaction:
+                await conn.execute("BEGIN")
+            if savepoint:
+                await conn.execute(f"SAVEPOINT {savepoint}")
+            else:
+                _log(f"LOG: Starting transaction for function '{func.__name__}'...")
+            _tx_depth[key] = depth + 1
+            try:
+                result = await func(conn, *args, **kwargs)
+            except Exception as e:
+                if savepoint:
+                    if conn.in_transaction:
+                        await conn.execute(f"ROLLBACK TO {savepoint}")
+                        await conn.execute(f"RELEASE {savepoint}")
+                else:
+                    _log(f"LOG: An error occurred. Rolling back transaction: {e}")
+                    await conn.rollback()
+                raise
+            else:
+                if savepoint:
+                    await conn.execute(f"RELEASE {savepoint}")
+                    if depth == 0 and batch._record():
+                        await batch.async_flush()
+                else:
+                    await conn.commit()
+                    _log("LOG: Transaction committed successfully.")
+                return result
+            finally:
+                if depth:
+                    _tx_depth[key] = depth
+                else:
+                    _tx_depth.pop(key, None)
+        # Tells with_db_connection to route this function to the primary
+        async_wrapper.is_transactional = True
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        key = id(conn)
+        depth = _tx_depth.get(key, 0)
+        batch = _tx_batches.get(key)
+        # Nested and batched calls get a savepoint instead of a commit
+        savepoint = f"tx_{depth}" if depth or batch else None
+        # Begin explicitly so that releasing the first savepoint does not
+        # commit (sqlite only begins implicitly before the first write).
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        if savepoint:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        else:
+            _log(f"LOG: Starting transaction for function '{func.__name__}'...")
+        _tx_depth[key] = depth + 1
         try:
-            # In sqlite3, a transaction is implicitly started with the first
-            # data-modifying statement (like INSERT, UPDATE, DELETE).
-            print(f"LOG: Starting transaction for function '{func.__name__}'...")
-            
             result = func(conn, *args, **kwargs)
-            
-            # If the function completes without errors, commit the changes.
-            conn.commit()
-            print("LOG: Transaction committed successfully.")
-            return result
         except Exception as e:
-            # If any error occurs, roll back all changes made during the transaction.
-            print(f"LOG: An error occurred. Rolling back transaction: {e}")
-            if conn:
+            if savepoint:
+                # Undo only this scope; the enclosing transaction goes on
+                if conn.in_transaction:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+            else:
+                # If any error occurs, roll back all changes made during the transaction.
+                _log(f"LOG: An error occurred. Rolling back transaction: {e}")
                 conn.rollback()
             # Re-raise the exception so it can be handled by other parts of the code.
             raise
+        else:
+            if savepoint:
+                conn.execute(f"RELEASE {savepoint}")
+                if depth == 0 and batch._record():
+                    batch.flush()
+            else:
+                # If the function completes without errors, commit the changes.
+                conn.commit()
+                _log("LOG: Transaction committed successfully.")
+            return result
+        finally:
+            if depth:
+                _tx_depth[key] = depth
+            else:
+                _tx_depth.pop(key, None)
+    wrapper.is_transactional = True
     return wrapper
 
+
+def benchmark_commit_modes(n=300, batch_size=100):
+    """
+    Measures updates/sec for n transactional updates on a file database,
+    first committing after every call, then grouped with CommitBatch.
+    Each per-call commit syncs to disk, so keep n in the hundreds.
+    Returns a dict of mode -> updates per second.
+    """
+    global VERBOSE
+    verbose, VERBOSE = VERBOSE, False
+
+    @transactional
+    def set_email(conn, user_id, email):
+        conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+            conn.executemany("INSERT INTO users (id, email) VALUES (?, ?)",
+                             ((i, '') for i in range(100)))
+            conn.commit()
+
+            start = time.perf_counter()
+            for i in range(n):
+                set_email(conn, i % 100, f"user{i}@example.com")
+            results['per_call_commit'] = n / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with CommitBatch(conn, max_calls=batch_size):
+                for i in range(n):
+                    set_email(conn, i % 100, f"user{i}@example.com")
+            results['grouped_commit'] = n / (time.perf_counter() - start)
+            conn.close()
+    finally:
+        VERBOSE = verbose
+    return results
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
@@ -99,3 +285,8 @@ if __name__ == '__main__':
     conn_reset.close()
     print("\nEmail has been reset for the next run.")
 
+    # --- Optional: compare per-call commits with grouped commits ---
+    if '--bench' in sys.argv:
+        for mode, rate in benchmark_commit_modes().items():
+            print(f"{mode}: {rate:,.0f} updates/sec")
+
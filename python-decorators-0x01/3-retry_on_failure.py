@@ -4,56 +4,250 @@ This module demonstrates a decorator that can retry a function
 if it fails, making the application more resilient to transient errors.
 """
 import time
+import asyncio
+import random
 import sqlite3
+import inspect
 import functools
+import threading
+from collections import Counter
 
 # --- Decorator from a previous task (required) ---
-def with_db_connection(func):
-    """Decorator to handle the database connection lifecycle."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = None
-        try:
-            conn = sqlite3.connect('users.db')
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            print(f"An error occurred in the connection wrapper: {e}")
-            raise
-        finally:
-            if conn:
-                conn.close()
-    return wrapper
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+QueryTimeoutError = __import__('1-with_db_connection').QueryTimeoutError
+
+# Counters across all retry_on_failure functions: 'retries',
+# 'timeouts' (timed-out attempts), 'budget_exhausted', 'gave_up'
+retry_metrics = Counter()
+
+# --- Resilience helpers used by retry_on_failure ---
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class RetryBudget:
+    """
+    A thread-safe token bucket that limits how many retries may be spent
+    across all calls sharing it.
+
+    Every first attempt is free; each retry withdraws one token. Tokens are
+    refilled continuously at `refill_rate` per second up to `capacity`, so a
+    burst of failures cannot multiply the load on a struggling database.
+    """
+    def __init__(self, capacity=10, refill_rate=1.0):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.refill_rate
+        )
+        self._updated = now
+
+    def try_acquire(self):
+        """Withdraws one retry token. Returns False if the budget is spent."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    A minimal closed/open/half-open circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once `reset_timeout` seconds have
+    passed a single trial call is let through (half-open); its outcome
+    closes or re-opens the circuit.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not reach the backend."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("circuit open: backend unavailable")
+                self.state = self.HALF_OPEN
+            elif self.state == self.HALF_OPEN:
+                # Only one trial call is allowed while half-open.
+                raise CircuitOpenError("circuit half-open: trial in progress")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def abandon_trial(self):
+        """
+        Called when a call ended without an outcome (e.g. KeyboardInterrupt
+        or cancellation). A pending half-open trial is given up so that the
+        next call may start a new one instead of the circuit staying
+        half-open forever.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self._failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    Returns the sleep before retry number `attempt` (0-based) using
+    exponential backoff with full jitter: uniform(0, min(cap, base * 2^n)).
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
 
 # --- New decorator for this task ---
-def retry_on_failure(retries=3, delay=1):
+def retry_on_failure(retries=3, delay=1, max_delay=30,
+                     exceptions=(sqlite3.OperationalError,),
+                     budget=None, breaker=None, retry_timeouts=True):
     """
     A decorator factory that makes a function retry its execution
     upon failure.
 
     Args:
         retries (int): The maximum number of attempts.
-        delay (int): The number of seconds to wait between retries.
+        delay (int): The base number of seconds for exponential backoff.
+        max_delay (int): The upper bound for a single backoff sleep.
+        exceptions (tuple): Exception classes that are considered transient.
+                            Anything else is raised immediately.
+        budget (RetryBudget, optional): Token bucket shared across calls.
+                                        Defaults to one per decorated function.
+        breaker (CircuitBreaker, optional): Fails fast while the backend is
+                                            down. Disabled when None.
+        retry_timeouts (bool): Whether a QueryTimeoutError is retried. Each
+                               retried timeout spends a budget token.
+
+    To retry timed-out queries, place this decorator above
+    with_db_connection(timeout=...) so every attempt gets a fresh deadline.
+    Outcomes are counted in `retry_metrics`.
     """
     def decorator(func):
+        retry_budget = budget if budget is not None else RetryBudget()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for i in range(retries):
+                    if breaker is not None:
+                        breaker.before_call()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except exceptions as e:
+                        if breaker is not None:
+                            breaker.record_failure()
+                        print(f"LOG: Attempt {i + 1} of {retries} failed: {e}")
+                        timed_out = isinstance(e, QueryTimeoutError)
+                        if timed_out:
+                            retry_metrics['timeouts'] += 1
+                        if i == retries - 1 or (timed_out and not retry_timeouts):
+                            retry_metrics['gave_up'] += 1
+                            print("LOG: All retries failed. Raising exception.")
+                            raise
+                        if not retry_budget.try_acquire():
+                            retry_metrics['budget_exhausted'] += 1
+                            print("LOG: Retry budget exhausted. Raising exception.")
+                            raise
+                        retry_metrics['retries'] += 1
+                        sleep_for = backoff_delay(i, delay, max_delay)
+                        print(f"LOG: Retrying in {sleep_for:.2f} second(s)...")
+                        # Yield to the event loop instead of blocking it
+                        await asyncio.sleep(sleep_for)
+                    except Exception:
+                        if breaker is not None:
+                            breaker.record_success()
+                        raise
+                    except BaseException:
+                        # e.g. asyncio.CancelledError
+                        if breaker is not None:
+                            breaker.abandon_trial()
+                        raise
+                    else:
+                        if breaker is not None:
+                            breaker.record_success()
+                        return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             for i in range(retries):
+                if breaker is not None:
+                    breaker.before_call()
                 try:
                     # Attempt to execute the decorated function
-                    return func(*args, **kwargs)
-                except Exception as e:
+                    result = func(*args, **kwargs)
+                except exceptions as e:
+                    if breaker is not None:
+                        breaker.record_failure()
                     # If it fails, log the attempt and error
                     print(f"LOG: Attempt {i + 1} of {retries} failed: {e}")
-                    
+
+                    timed_out = isinstance(e, QueryTimeoutError)
+                    if timed_out:
+                        retry_metrics['timeouts'] += 1
+
                     # If this was the last attempt, re-raise the exception
-                    if i == retries - 1:
+                    if i == retries - 1 or (timed_out and not retry_timeouts):
+                        retry_metrics['gave_up'] += 1
                         print("LOG: All retries failed. Raising exception.")
                         raise
-                    
-                    # Wait for the specified delay before the next attempt
-                    print(f"LOG: Retrying in {delay} second(s)...")
-                    time.sleep(delay)
+
+                    # Do not amplify an outage once the shared budget is spent
+                    if not retry_budget.try_acquire():
+                        retry_metrics['budget_exhausted'] += 1
+                        print("LOG: Retry budget exhausted. Raising exception.")
+                        raise
+                    retry_metrics['retries'] += 1
+
+                    # Wait with exponential backoff and full jitter
+                    sleep_for = backoff_delay(i, delay, max_delay)
+                    print(f"LOG: Retrying in {sleep_for:.2f} second(s)...")
+                    time.sleep(sleep_for)
+                except Exception:
+                    # A non-transient error still proves the backend answered
+                    if breaker is not None:
+                        breaker.record_success()
+                    raise
+                except BaseException:
+                    # e.g. KeyboardInterrupt: no verdict on the backend
+                    if breaker is not None:
+                        breaker.abandon_trial()
+                    raise
+                else:
+                    if breaker is not None:
+                        breaker.record_success()
+                    return result
         return wrapper
     return decorator
 
@@ -3,67 +3,336 @@
 This module demonstrates a decorator for caching database query results
 to improve performance by avoiding redundant database calls.
 """
+import os
+import sys
 import time
+import pickle
+import tempfile
+import asyncio
 import sqlite3
+import inspect
 import functools
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueryCache(dict):
+    """
+    An in-memory cache of query results implemented as a dictionary,
+    extended with optional per-entry TTLs and per-key access statistics.
+
+    The statistics drive warm_up(), and snapshot()/restore() persist the
+    entries (with their remaining TTLs) and the statistics across restarts.
+    """
+    def __init__(self):
+        super().__init__()
+        # key -> absolute expiry as a wall-clock timestamp, or None
+        self.expires = {}
+        # key -> number of lookups, hits and misses alike
+        self.accesses = Counter()
+        self._lock = threading.Lock()
+
+    def lookup(self, key, record=True):
+        """
+        Returns (True, value) for a live entry, else (False, None).
+        The lookup counts towards the key's access stats if `record` is set.
+        """
+        if record:
+            self.accesses[key] += 1
+        if key not in self:
+            return False, None
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            with self._lock:
+                self.pop(key, None)
+                self.expires.pop(key, None)
+            return False, None
+        return True, self[key]
+
+    def store(self, key, value, ttl=None):
+        with self._lock:
+            self[key] = value
+            self.expires[key] = time.time() + ttl if ttl is not None else None
+
+    def hottest(self, n):
+        """The n most frequently looked-up keys."""
+        return [key for key, _ in self.accesses.most_common(n)]
+
+    def snapshot(self, path):
+        """Atomically writes live entries, expiries and access stats to path."""
+        now = time.time()
+        with self._lock:
+            entries = {
+                key: (value, self.expires.get(key))
+                for key, value in self.items()
+                if self.expires.get(key) is None or self.expires[key] > now
+            }
+            state = {'entries': entries, 'accesses': dict(self.accesses)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def restore(self, path):
+        """
+        Loads a snapshot written by snapshot(), skipping entries that expired
+        in the meantime. Only restore snapshots this process wrote: they are
+        pickles. Returns the number of entries restored.
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        now = time.time()
+        restored = 0
+        with self._lock:
+            for key, (value, expires) in state['entries'].items():
+                if expires is None or expires > now:
+                    self[key] = value
+                    self.expires[key] = expires
+                    restored += 1
+            self.accesses.update(state['accesses'])
+        return restored
+
 
 # A simple in-memory cache implemented as a dictionary
-query_cache = {}
+query_cache = QueryCache()
 
 # --- Decorator from a previous task (required) ---
-def with_db_connection(func):
-    """Decorator to handle the database connection lifecycle."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = None
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+# Pending async lookups keyed like query_cache. Concurrent coroutines that
+# miss on the same key await one shared task instead of each hitting the DB.
+_inflight_queries = {}
+
+
+def _forget_inflight(cache_key):
+    """Done callback removing a finished task from _inflight_queries."""
+    def forget(task):
+        if _inflight_queries.get(cache_key) is task:
+            del _inflight_queries[cache_key]
+    return forget
+
+
+# Results estimated larger than this many bytes are never cached
+CACHE_MAX_RESULT_BYTES = 1024 * 1024
+
+
+def _cache_key(args, kwargs):
+    """
+    Finds the query string from either positional or keyword arguments:
+    the 'query' keyword, else the first string argument (after 'conn').
+    """
+    query = kwargs.get('query')
+    if not query:
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    return query
+
+
+def row_size(row):
+    """Approximate memory footprint of one row tuple and its values."""
+    size = sys.getsizeof(row)
+    if isinstance(row, tuple):
+        size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+def result_size(result):
+    """Approximate memory footprint of a fetchall()/fetchone() result."""
+    if isinstance(result, list):
+        return sys.getsizeof(result) + sum(row_size(row) for row in result)
+    return row_size(result)
+
+
+class StreamedRows(list):
+    """The cached rows of a streamed result, replayed as a stream on hits."""
+
+
+class CachedRowStream:
+    """
+    A closable iterator over cached rows, returned on cache hits for
+    streamed results so that hits and misses are used the same way.
+    """
+    def __init__(self, rows):
+        self._rows = iter(rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def close(self):
+        self._rows = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class BudgetedCachingStream:
+    """
+    Wraps a row stream returned by a streaming function. Rows are passed
+    through to the caller and copied into a buffer; if the stream is
+    exhausted before the buffer exceeds `max_bytes`, the rows are cached
+    as StreamedRows, otherwise buffering stops and nothing is cached.
+    """
+    def __init__(self, rows, cache_key, max_bytes, ttl):
+        self._rows = rows
+        self._cache_key = cache_key
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._buffer = StreamedRows()
+        self._size = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
         try:
-            conn = sqlite3.connect('users.db')
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            print(f"An error occurred in the connection wrapper: {e}")
+            row = next(self._rows)
+        except StopIteration:
+            if self._buffer is not None:
+                query_cache.store(self._cache_key, self._buffer, self._ttl)
+                self._buffer = None
             raise
-        finally:
-            if conn:
-                conn.close()
-    return wrapper
+        if self._buffer is not None:
+            self._size += row_size(row)
+            if self._size > self._max_bytes:
+                print(f"LOG: Result for '{self._cache_key}' exceeds the cache budget; not caching.")
+                self._buffer = None
+            else:
+                self._buffer.append(row)
+        return row
+
+    def close(self):
+        self._buffer = None
+        if hasattr(self._rows, 'close'):
+            self._rows.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
 
 # --- New decorator for this task ---
-def cache_query(func):
+def cache_query(func=None, *, ttl=None, max_bytes=None):
     """
     A decorator that caches the results of a function based on its arguments.
-    It uses the SQL query string as the key for the cache.
+    It uses the SQL query string as the key for the cache. Entries live for
+    `ttl` seconds, or until evicted when ttl is None.
+
+    Only results under `max_bytes` (default CACHE_MAX_RESULT_BYTES) are
+    cached. Placed above with_db_connection(stream=True), rows are streamed
+    to the caller and cached only if the whole result fits the budget; hits
+    then return a CachedRowStream over the cached rows.
+
+    For coroutine functions the lookup is single-flight: while one coroutine
+    is fetching a key, others asking for the same key wait for its result.
+    The fetch uses the first caller's connection; if that caller is
+    cancelled, the waiters fetch again on their own connections.
     """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, max_bytes=max_bytes)
+
+    def fits_budget(cache_key, result):
+        budget = CACHE_MAX_RESULT_BYTES if max_bytes is None else max_bytes
+        if result_size(result) <= budget:
+            return True
+        print(f"LOG: Result for '{cache_key}' exceeds the cache budget; not caching.")
+        return False
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            cache_key = _cache_key(args, kwargs)
+            found, cached = query_cache.lookup(cache_key)
+            if found:
+                print(f"LOG: Returning result from cache for key: '{cache_key}'")
+                return cached
+
+            while True:
+                task = _inflight_queries.get(cache_key)
+                if task is None:
+                    print(f"LOG: Query not in cache. Executing and caching result for key: '{cache_key}'")
+                    task = asyncio.ensure_future(func(*args, **kwargs))
+                    _inflight_queries[cache_key] = task
+                    task.add_done_callback(_forget_inflight(cache_key))
+                    # The fetch runs on this caller's connection, so it is
+                    # not shielded: cancelling the caller cancels the fetch
+                    # before with_db_connection closes the connection.
+                    result = await task
+                    break
+
+                print(f"LOG: Waiting for in-flight query for key: '{cache_key}'")
+                try:
+                    # Shield so a cancelled waiter does not cancel the fetch
+                    result = await asyncio.shield(task)
+                    break
+                except asyncio.CancelledError:
+                    current = asyncio.current_task()
+                    if not task.cancelled() or current.cancelling():
+                        raise
+                    # The leader was cancelled: fetch on this caller's
+                    # own connection instead
+                    print(f"LOG: In-flight query for key '{cache_key}' was cancelled; retrying.")
+
+            if fits_budget(cache_key, result):
+                query_cache.store(cache_key, result, ttl)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Create a unique key for the cache. A simple way is to use the
-        # string representation of all arguments. For this task, we focus
-        # on the 'query' argument.
-        
-        # Find the query string from either positional or keyword arguments
-        query = kwargs.get('query')
-        if not query and args:
-            # Assumes the query is the second argument after 'conn'
-            if len(args) > 1:
-                query = args[1]
-
         # Use the query string as the cache key
-        cache_key = query
+        cache_key = _cache_key(args, kwargs)
 
         # Check if the result is already in the cache
-        if cache_key in query_cache:
+        found, cached = query_cache.lookup(cache_key)
+        if found:
             print(f"LOG: Returning result from cache for key: '{cache_key}'")
-            return query_cache[cache_key]
+            if isinstance(cached, StreamedRows):
+                return CachedRowStream(cached)
+            return cached
 
         # If not in cache, execute the function
         print(f"LOG: Query not in cache. Executing and caching result for key: '{cache_key}'")
         result = func(*args, **kwargs)
-        
+
+        # Streams are cached as they are consumed, if they fit the budget
+        if hasattr(result, '__next__'):
+            budget = CACHE_MAX_RESULT_BYTES if max_bytes is None else max_bytes
+            return BudgetedCachingStream(result, cache_key, budget, ttl)
+
         # Store the result in the cache
-        query_cache[cache_key] = result
+        if fits_budget(cache_key, result):
+            query_cache.store(cache_key, result, ttl)
         return result
     return wrapper
 
+
+def warm_up(fetch, n=10, max_workers=4):
+    """
+    Replays the n hottest cache keys (by recorded accesses) through `fetch`,
+    a with_db_connection + cache_query function taking `query=`, in
+    parallel so the cache is populated before traffic arrives. Keys that
+    are already cached, e.g. after restore(), are skipped.
+
+    Returns the list of keys that were fetched.
+    """
+    keys = [key for key in query_cache.hottest(n)
+            if key is not None
+            and not query_cache.lookup(key, record=False)[0]]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(lambda key: fetch(query=key), keys))
+    return keys
+
 @with_db_connection
 @cache_query
 def fetch_users_with_cache(conn, query):
@@ -103,3 +372,11 @@ if __name__ == '__main__':
     print("Assertion passed: Results from both calls are identical.")
     print(f"\nCurrent cache state: {query_cache}")
 
+    # --- Survive a restart: snapshot, clear, then restore and warm up ---
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'query_cache.snapshot')
+        query_cache.snapshot(snapshot_path)
+        query_cache.clear()
+        restored = query_cache.restore(snapshot_path)
+    print(f"Restored {restored} entries; warmed up {warm_up(fetch_users_with_cache)}")
+
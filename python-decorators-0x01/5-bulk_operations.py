@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""
+This module demonstrates decorators that turn per-row database functions
+into vectorized calls: writes are sent through a single `executemany` and
+reads through one `WHERE id IN (...)` lookup, with the results split back
+to each caller.
+"""
+import time
+import sqlite3
+import inspect
+import functools
+import threading
+from concurrent.futures import Future
+
+# SQLite limits the number of host parameters in a single statement
+# (999 before 3.32), so large IN (...) lookups are split into chunks.
+MAX_IN_PARAMS = 900
+
+
+class MicroBatcher:
+    """
+    Collects single-item calls made concurrently from several threads and
+    runs them as one batch.
+
+    The first caller of a window becomes the leader: it waits up to
+    `window` seconds (or until `max_batch` items are queued), runs the
+    whole batch on its own connection and hands each follower its own
+    result. A full batch is closed, so later callers start a new one.
+
+    With `per_connection=True` (writes) only calls on the same connection
+    are merged, so every write lands in its caller's own transaction.
+    Otherwise (reads) calls on any connection are merged and run on the
+    leader's connection, which sees committed data but not the followers'
+    uncommitted writes.
+    """
+    def __init__(self, run_many, window=0.002, max_batch=500,
+                 per_connection=True):
+        self.run_many = run_many
+        self.window = window
+        self.max_batch = max_batch
+        self.per_connection = per_connection
+        self.batches = 0
+        self._lock = threading.Lock()
+        # id(conn), or None when shared -> (pending (item, future) pairs,
+        # batch-full event)
+        self._pending = {}
+
+    def submit(self, conn, item):
+        future = Future()
+        key = id(conn) if self.per_connection else None
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = ([], threading.Event())
+            pending, full = batch
+            pending.append((item, future))
+            if len(pending) >= self.max_batch:
+                del self._pending[key]
+                full.set()
+
+        if leader:
+            full.wait(self.window)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            self._run(conn, pending)
+        return future.result()
+
+    def _run(self, conn, batch):
+        self.batches += 1
+        try:
+            results = self.run_many(conn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _bulk_decorator(run_many, window, max_batch, per_connection):
+    """
+    Builds a decorator that exposes `run_many` as `func.many(conn, items)`
+    and, when `window` is set, routes single calls through a MicroBatcher.
+    Each item is the tuple of the call's arguments after `conn`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def as_item(conn, args, kwargs):
+            bound = signature.bind(conn, *args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.values())[1:]
+
+        batcher = None
+        if window is not None:
+            batcher = MicroBatcher(run_many, window, max_batch,
+                                   per_connection)
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            if batcher is None:
+                return func(conn, *args, **kwargs)
+            return batcher.submit(conn, as_item(conn, args, kwargs))
+
+        wrapper.many = run_many
+        wrapper.batcher = batcher
+        return wrapper
+    return decorator
+
+
+# --- New decorators for this task ---
+def bulk_write(sql, params, window=None, max_batch=500):
+    """
+    A decorator factory for per-row write functions.
+
+    Args:
+        sql (str): The parameterized statement the function executes.
+        params (callable): Maps the function's arguments (without `conn`)
+                           to the statement's parameter tuple.
+        window (float, optional): Micro-batching window in seconds for
+                                  concurrent callers on the same
+                                  connection. Disabled when None.
+        max_batch (int): Largest batch collected within one window.
+
+    The decorated function gains `many(conn, items)`, which writes every
+    item with one `executemany` and returns a list of None per item.
+    Committing is left to the caller (e.g. @transactional).
+    """
+    def run_many(conn, items):
+        conn.executemany(sql, [params(*item) for item in items])
+        return [None] * len(items)
+    return _bulk_decorator(run_many, window, max_batch, per_connection=True)
+
+
+def bulk_read(table, key='id', window=None, max_batch=500):
+    """
+    A decorator factory for functions that fetch one row by key.
+
+    Args:
+        table (str): The table to read from.
+        key (str): The key column; the function's first argument after
+                   `conn` is its value.
+        window (float, optional): Micro-batching window in seconds for
+                                  concurrent callers on any connection.
+                                  Disabled when None.
+        max_batch (int): Largest batch collected within one window.
+
+    The decorated function gains `many(conn, keys)`, which fetches every key
+    with `SELECT * ... WHERE key IN (...)` and returns the matching row
+    (or None) for each requested key, in order.
+    """
+    def run_many(conn, items):
+        keys = [item[0] if isinstance(item, tuple) else item for item in items]
+        unique = list(dict.fromkeys(keys))
+        rows = {}
+        for start in range(0, len(unique), MAX_IN_PARAMS):
+            chunk = unique[start:start + MAX_IN_PARAMS]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor = conn.execute(
+                f"SELECT * FROM {table} WHERE {key} IN ({placeholders})", chunk
+            )
+            index = [column[0] for column in cursor.description].index(key)
+            for row in cursor:
+                rows[row[index]] = row
+        return [rows.get(k) for k in keys]
+    return _bulk_decorator(run_many, window, max_batch, per_connection=False)
+
+
+@bulk_read('users', key='id')
+def get_user_by_id(conn, user_id):
+    """Fetches a single user by their ID."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+@bulk_write("UPDATE users SET email = ? WHERE id = ?",
+            params=lambda user_id, new_email: (new_email, user_id))
+def update_user_email(conn, user_id, new_email):
+    """Updates a single user's email."""
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
+# --- Compare per-row calls with vectorized calls ---
+if __name__ == '__main__':
+    # Make sure you have run setup_db.py first
+    conn = sqlite3.connect('users.db')
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    lookups = user_ids * 100
+
+    start = time.perf_counter()
+    one_by_one = [get_user_by_id(conn, user_id) for user_id in lookups]
+    print(f"{len(lookups)} single lookups: {time.perf_counter() - start:.4f} s")
+
+    start = time.perf_counter()
+    vectorized = get_user_by_id.many(conn, lookups)
+    print(f"One IN (...) lookup: {time.perf_counter() - start:.4f} s")
+    assert one_by_one == vectorized
+
+    # Writes are rolled back so the demo leaves users.db unchanged
+    update_user_email.many(conn, [(i, f"user{i}@example.com") for i in user_ids])
+    print(f"Updated {len(user_ids)} emails with one executemany")
+    conn.rollback()
+    conn.close()
@@ -0,0 +1,206 @@
+#!/usr/bin/python3
+"""
+This module benchmarks the per-call overhead of the database decorators,
+alone and in common stacks, against a shared in-memory SQLite database.
+
+For every case it reports:
+    ns/call       best-of-repeats wall time per call
+    overhead      ns/call minus the undecorated baseline
+    peak B/call   peak traced memory allocated during a single call
+    blocks/call   memory blocks still allocated afterwards, per call
+                  (non-zero means the path retains memory)
+
+Usage:
+    ./benchmark_decorators.py                      print the table
+    ./benchmark_decorators.py --save base.json     also save the results
+    ./benchmark_decorators.py --compare base.json  fail on regressions
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tracemalloc
+import contextlib
+
+log_module = __import__('0-log_queries')
+connection_module = __import__('1-with_db_connection')
+transaction_module = __import__('2-transactional')
+retry_module = __import__('3-retry_on_failure')
+cache_module = __import__('4-cache_query')
+
+log_queries = log_module.log_queries
+with_db_connection = connection_module.with_db_connection
+transactional = transaction_module.transactional
+retry_on_failure = retry_module.retry_on_failure
+cache_query = cache_module.cache_query
+
+DB_URI = 'file:decorator_bench?mode=memory&cache=shared'
+QUERY = "SELECT * FROM users WHERE id = 1"
+# A case is a regression when it is this much slower than the saved run
+REGRESSION_TOLERANCE = 0.25
+
+
+def setup_database():
+    """
+    Creates the users table in the shared in-memory database and points
+    with_db_connection at it. The returned connection keeps it alive.
+    """
+    anchor = sqlite3.connect(DB_URI, uri=True)
+    anchor.execute("DROP TABLE IF EXISTS users")
+    anchor.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+    )
+    anchor.executemany(
+        "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+        ((f"user{i}", f"user{i}@example.com", 20 + i % 50) for i in range(100))
+    )
+    anchor.commit()
+    connection_module.DB_NAME = DB_URI
+    # Keep the measurement on the hot path: no per-call output
+    transaction_module.VERBOSE = False
+    log_module.SAMPLE_RATE = 0.0
+    return anchor
+
+
+def build_cases():
+    """Returns (name, callable) pairs; each callable performs one call."""
+    # A plain connection for the cases without with_db_connection, so no
+    # pooled connection is held outside the pool
+    conn = sqlite3.connect(DB_URI, uri=True)
+
+    def fetch(conn, query=QUERY):
+        return conn.execute(query).fetchall()
+
+    logged = log_queries(fetch)
+    connected = with_db_connection(fetch)
+    in_transaction = transactional(fetch)
+    retried = retry_on_failure(retries=3, delay=0)(fetch)
+    cached = cache_query(fetch)
+    connected_tx = with_db_connection(transactional(fetch))
+    connected_cached = with_db_connection(
+        retry_on_failure(retries=3, delay=0)(cache_query(fetch))
+    )
+    full_stack = with_db_connection(
+        transactional(retry_on_failure(retries=3, delay=0)(
+            cache_query(log_queries(fetch))
+        ))
+    )
+
+    def cache_miss():
+        cache_module.query_cache.clear()
+        cached(conn, QUERY)
+
+    def full_stack_miss():
+        cache_module.query_cache.clear()
+        full_stack(query=QUERY)
+
+    return [
+        ('baseline', lambda: fetch(conn, QUERY)),
+        ('log_queries', lambda: logged(conn, QUERY)),
+        ('with_db_connection', lambda: connected(query=QUERY)),
+        ('transactional', lambda: in_transaction(conn, QUERY)),
+        ('retry_on_failure', lambda: retried(conn, QUERY)),
+        ('cache_query (hit)', lambda: cached(conn, QUERY)),
+        ('cache_query (miss)', cache_miss),
+        ('connection+transactional', lambda: connected_tx(query=QUERY)),
+        ('connection+retry+cache (hit)', lambda: connected_cached(query=QUERY)),
+        ('full stack (hit)', lambda: full_stack(query=QUERY)),
+        ('full stack (miss)', full_stack_miss),
+    ]
+
+
+def time_call(call, number, repeat):
+    """Best-of-`repeat` nanoseconds per call over `number` calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            call()
+        elapsed = (time.perf_counter_ns() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_memory(call, number):
+    """Peak bytes traced during one call and retained blocks per call."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    blocks = sys.getallocatedblocks()
+    for _ in range(number):
+        call()
+    retained = (sys.getallocatedblocks() - blocks) / number
+    return peak - before, retained
+
+
+def run(number=2000, repeat=5):
+    """Runs every case and returns a list of result dicts."""
+    anchor = setup_database()
+    results = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cases = build_cases()
+        for _, call in cases:
+            for _ in range(100):  # warm pools, caches and statement caches
+                call()
+        baseline = None
+        for name, call in cases:
+            ns = time_call(call, number, repeat)
+            peak, retained = measure_memory(call, number)
+            if baseline is None:
+                baseline = ns
+            results.append({
+                'case': name,
+                'ns_per_call': round(ns, 1),
+                'overhead_ns': round(ns - baseline, 1),
+                'peak_bytes_per_call': peak,
+                'retained_blocks_per_call': round(retained, 3),
+            })
+    anchor.close()
+    return results
+
+
+def print_table(results):
+    print(f"{'case':<32}{'ns/call':>12}{'overhead':>12}{'peak B/call':>13}{'blocks/call':>13}")
+    for row in results:
+        print(f"{row['case']:<32}{row['ns_per_call']:>12,.0f}"
+              f"{row['overhead_ns']:>12,.0f}{row['peak_bytes_per_call']:>13,}"
+              f"{row['retained_blocks_per_call']:>13.3f}")
+
+
+def find_regressions(results, saved):
+    """Cases whose ns/call grew by more than REGRESSION_TOLERANCE."""
+    previous = {row['case']: row['ns_per_call'] for row in saved}
+    return [
+        (row['case'], previous[row['case']], row['ns_per_call'])
+        for row in results
+        if row['case'] in previous
+        and row['ns_per_call'] > previous[row['case']] * (1 + REGRESSION_TOLERANCE)
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--compare', metavar='FILE')
+    options = parser.parse_args()
+
+    results = run(options.number, options.repeat)
+    print_table(results)
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options.compare:
+        with open(options.compare) as f:
+            regressions = find_regressions(results, json.load(f))
+        for case, before, after in regressions:
+            print(f"REGRESSION: {case}: {before:,.0f} -> {after:,.0f} ns/call")
+        sys.exit(1 if regressions else 0)